@@ -1,33 +1,55 @@
 # Import necessary modules and functions
-from resources.dev import config
+from resources import config
 from src.main.utility.encrypt_decrypt import *
 from src.main.utility.s3_client_object import S3ClientProvider
 from src.main.utility.logging_config import logger
-from src.main.utility.my_sql_session import get_mysql_connection
+from src.main.write.staging_table_repository import StagingTableRepository
 from src.main.read.aws_read import S3Reader
+from src.main.read.csv_header_read import CsvHeaderValidator
+from src.main.read.sales_data_read import read_sales_data, cache_sales_data, read_cached_sales_data, \
+    group_files_by_header
+from src.main.cache.source_file_cache import SourceFileCache
+from src.main.utility.s3_transfer import compute_s3_etag
+from src.main.utility.checkpoint import PipelineCheckpoint
+from src.main.utility.dataframe_cache import DataFrameCache
+from src.main.utility.diagnostics import preview
+from src.main.utility.stage_metrics import StageMetrics, path_size
+from src.main.utility.dag_scheduler import DagScheduler
 from src.main.download.aws_file_download import S3FileDownloader
-from src.main.utility.spark_session import spark_session
-from src.main.move import move_files
+from src.main.utility.spark_session import spark_session, configure_s3a
 from src.main.read.database_read import DatabaseReader
-from src.main.transformations.jobs.dimension_tables_join import dimesions_table_join
+from src.main.cache.dimension_cache import DimensionCache
+from src.main.transformations.jobs.dimension_tables_join import dimesions_table_join, \
+    customer_columns, store_columns, sales_team_columns
 from src.main.write.parquet_writer import ParquetWriter
 from src.main.upload.upload_to_s3 import UploadToS3
 from src.main.transformations.jobs.customer_mart_sql_tranform_write import customer_mart_calculation_table_write
 from src.main.transformations.jobs.sales_mart_sql_transform_write import sales_mart_calculation_table_write
+from src.main.transformations.jobs.sales_rollup import build_sales_rollup
+from src.main.transformations.jobs.arrow_engine import ArrowEngine
+from src.main.write.mart_upsert import MartUpserter
 from src.main.delete.local_file_delete import delete_local_file
 from src.main.move.move_files import move_s3_to_s3
+import atexit
 import shutil
 import datetime
+from collections import Counter
 from pyspark.sql.types import *
 from pyspark.sql.functions import *
 
+# Wall time, CPU time, rows and bytes of every stage, written as a JSON run
+# report and a Prometheus text file when the run ends (also on failure)
+stage_metrics = StageMetrics(labels={"env": os.environ.get("ETL_ENV", "dev")})
+atexit.register(stage_metrics.write_reports, config.stage_metrics_directory)
+
 # Retrieve AWS access keys from config
 aws_access_key = config.aws_access_key
 aws_secret_key = config.aws_secret_key
 
 
 # Create a S3 client object using decrypted AWS access keys
-s3_client_provider = S3ClientProvider(decrypt(aws_access_key), decrypt(aws_secret_key))
+s3_client_provider = S3ClientProvider(decrypt(aws_access_key), decrypt(aws_secret_key),
+                                      endpoint_url=config.s3_endpoint_url)
 s3_client = s3_client_provider.get_client()
 response = s3_client.list_buckets()
 logger.info("List of buckets: %s", response['Buckets'])
@@ -37,23 +59,11 @@ logger.info("List of buckets: %s", response['Buckets'])
 # with a status of 'A'. If so, do not delete the file and try to re-run.
 # Otherwise, throw an error and do not proceed further.
 
+staging_table = StagingTableRepository(config.database_name, config.product_staging_table)
 csv_files = [file for file in os.listdir(config.local_directory) if file.endswith(".csv")]
-connection = get_mysql_connection()
-cursor = connection.cursor()
 
-total_csv_files = []
 if csv_files:
-    for file in csv_files:
-        total_csv_files.append(f"'{file}'")
-    
-    statement = f"""
-                SELECT DISTINCT file_name FROM
-                {config.database_name}.{config.product_staging_table}
-                WHERE file_name IN ({', '.join(total_csv_files)}) AND status = 'A';
-                """
-    logger.info(f"Dynamically created statement: {statement}")
-    cursor.execute(statement)
-    data = cursor.fetchall()
+    data = staging_table.find_files_with_status(csv_files, 'A')
     if data:
         logger.info("Your last run failed. Please check the status of the file in the staging area.")
     else:
@@ -65,106 +75,152 @@ try:
     s3_reader = S3Reader()
     # Bucket name should be read from the configuration.
     folder_path = config.s3_source_directory
-    s3_absolute_path = s3_reader.list_files(s3_client, config.bucket_name, folder_path)
-    logger.info("Absolute path of the files: %s", s3_absolute_path)
+    with stage_metrics.stage("list_source") as stage:
+        s3_objects = list(s3_reader.iter_objects(s3_client, config.bucket_name, folder_path,
+                                                 fan_out=config.s3_list_fan_out))
+        stage.rows_out = len(s3_objects)
+    s3_absolute_path = [f"s3://{config.bucket_name}/{obj['key']}" for obj in s3_objects]
+    logger.info("Number of files found under the folder: %s", len(s3_absolute_path))
     if not s3_absolute_path:
         logger.info(f"No files found in the folder: {folder_path}")
         raise Exception(f"No data available to process in the folder: {folder_path}")
+    # Files are tracked by file name (local copies, checkpoints, the staging table),
+    # the same name under two shards of the fan-out would be merged into one
+    listed_names = Counter(os.path.basename(obj["key"]) for obj in s3_objects)
+    duplicate_names = sorted(name for name, count in listed_names.items() if count > 1)
+    if duplicate_names:
+        raise Exception(f"Source files share a file name across prefixes: {duplicate_names}")
 
 except Exception as e:
     logger.error("Exited with error: %s", e)
     raise e
 
+# A run that failed part way through moving its processed files to the processed
+# folder left the rest in the source folder, that move is finished here
+listed_key_by_name = {os.path.basename(obj["key"]): obj["key"] for obj in s3_objects}
+for batch_id, batch_file_names in PipelineCheckpoint.find_unfinished_moves(config.checkpoint_directory).items():
+    leftover_keys = [listed_key_by_name[name] for name in batch_file_names if name in listed_key_by_name]
+    if leftover_keys:
+        logger.info(f"Finishing the move of batch {batch_id} to the processed folder: {leftover_keys}")
+        message = move_s3_to_s3(s3_client, config.bucket_name, config.s3_source_directory,
+                                config.s3_processed_directory, keys=leftover_keys)
+        logger.info(f"{message}")
+    PipelineCheckpoint.remove(config.checkpoint_directory, batch_id)
+
+# Files the staging table already marks processed ('I') are never part of a new batch
+processed_file_names = staging_table.find_files_with_status(list(listed_key_by_name), 'I')
+if processed_file_names:
+    logger.info(f"Skipping files already processed by an earlier run: {sorted(processed_file_names)}")
+    s3_objects = [obj for obj in s3_objects if os.path.basename(obj["key"]) not in processed_file_names]
+    if not s3_objects:
+        raise Exception(f"No data available to process in the folder: {folder_path}")
+
 # Load bucket name and local directory configuration
 bucket_name = config.bucket_name
 local_directory = config.local_directory
 
-# Construct the S3 prefix for the bucket
-prefix = f"s3://{bucket_name}/"
-
-# Extract file paths relative to the S3 bucket from the absolute S3 paths
-file_paths = [url[len(prefix):] for url in s3_absolute_path]
-
-# Log the bucket name and the file paths that will be downloaded
-logger.info("File path available on s3 bucket under name %s and path %s", bucket_name, file_paths)
-
-try:
-    # Initialize the S3 file downloader
-    downloader = S3FileDownloader(s3_client, bucket_name, local_directory)
-    
-    # Download the files from S3 to the local directory
-    downloader.download_files(file_paths)
-except Exception as e:
-    # Log any error that occurs during the download process and exit the program
-    logger.error("Error in downloading files: %s", e)
-    sys.exit()
+# Log the bucket name and the number of objects that will be downloaded
+logger.info("Files available on s3 bucket %s: %s", bucket_name, len(s3_objects))
 
-# Get a list of all the files in the local directory after the download
-all_files = os.listdir(local_directory)
-logger.info(f"List of files present in the local directory after download: {all_files}")
+# S3 key of every file to process, the error and processed moves use the exact keys
+key_by_file = {}
 
-# Filter the files to find CSV files and create their absolute paths
-if all_files:
+if config.ingestion_mode == "s3a":
+    # Spark executors read the objects straight from S3, nothing is downloaded
+    logger.info("*****************Direct S3 ingestion, skipping the local download*****************")
     csv_files = []
     error_files = []
-    
-    # Iterate over all files to separate CSV files and non-CSV files
-    for file in all_files:
-        if file.endswith(".csv"):
-            csv_files.append(os.path.abspath(os.path.join(local_directory, file)))
+    for obj in s3_objects:
+        spark_path = s3_reader.to_spark_path(bucket_name, obj["key"])
+        key_by_file[spark_path] = obj["key"]
+        if obj["key"].endswith(".csv"):
+            csv_files.append(spark_path)
         else:
-            error_files.append(os.path.abspath(os.path.join(local_directory, file)))
-    
-    # If no CSV files are found, log an error and raise an exception
+            error_files.append(spark_path)
+
     if not csv_files:
-        logger.error("No CSV data available in the local directory.")
-        raise Exception("No CSV data available in the local directory.")
+        logger.error("No CSV data available in the source folder.")
+        raise Exception("No CSV data available in the source folder.")
 else:
-    # If no files are present in the local directory, log an error and raise an exception
-    logger.error("There is no data to process.")
-    raise Exception("There is no data to process.")
+    try:
+        # Initialize the S3 file downloader
+        downloader = S3FileDownloader(s3_client, bucket_name, local_directory)
+
+        # Download the files from S3 to the local directory in parallel,
+        # files already present with the same size and ETag are skipped
+        with stage_metrics.stage("download") as stage:
+            download_results = downloader.download_files(s3_objects)
+            stage.rows_in = len(s3_objects)
+            stage.rows_out = sum(1 for result in download_results if not result["skipped"])
+            stage.bytes_written = sum(result["bytes"] for result in download_results if not result["skipped"])
+        key_by_file.update({os.path.abspath(result["local_path"]): result["key"] for result in download_results})
+    except Exception as e:
+        # Log any error that occurs during the download process and exit the program
+        logger.error("Error in downloading files: %s", e)
+        sys.exit()
+
+    # Get a list of all the files in the local directory after the download
+    all_files = os.listdir(local_directory)
+    logger.info(f"List of files present in the local directory after download: {all_files}")
+
+    # Filter the files to find CSV files and create their absolute paths
+    if all_files:
+        csv_files = []
+        error_files = []
+
+        # Iterate over all files to separate CSV files and non-CSV files
+        for file in all_files:
+            if file in processed_file_names:
+                logger.info(f"Ignoring {file} in the local directory, it was already processed")
+            elif file.endswith(".csv"):
+                csv_files.append(os.path.abspath(os.path.join(local_directory, file)))
+            else:
+                error_files.append(os.path.abspath(os.path.join(local_directory, file)))
+
+        # If no CSV files are found, log an error and raise an exception
+        if not csv_files:
+            logger.error("No CSV data available in the local directory.")
+            raise Exception("No CSV data available in the local directory.")
+    else:
+        # If no files are present in the local directory, log an error and raise an exception
+        logger.error("There is no data to process.")
+        raise Exception("There is no data to process.")
 
 # Convert the CSV files string representation into a list
 # csv_files = str(csv_files)[1:-1]
 logger.info("*****************List of CSV files*****************")
 logger.info("List of CSV files that needs to be processed %s", csv_files)
 
-# Initialize and create a Spark session
-logger.info("*****************Creating a spark session*****************")
-spark = spark_session()
-logger.info("*****************Spark session created.*****************")
-
 # Check the required columns in the schema of CSV files
-# If there are any columns that are not required, keep them in a list or error_files
-# Else, union all the data into one dataframe
-
+# Only the header line of every file is read, in parallel, before Spark is involved.
+# Files missing any required column go to error_files,
+# files with extra columns are still processed.
 logger.info("*****************Checking the schema of the CSV files loaded in S3*****************")
+logger.info(f"Required columns are: {config.mandatory_columns}")
+
+header_validator = CsvHeaderValidator(config.mandatory_columns, s3_client=s3_client)
+with stage_metrics.stage("schema_check") as stage:
+    schema_check = header_validator.validate(csv_files)
+    stage.rows_in = len(csv_files)
+    stage.rows_out = len(schema_check["correct"]) + len(schema_check["extra"])
+file_headers = schema_check["headers"]
 
 # List to store the files with correct schemas
-correct_files = []
-
-# Iterate through each CSV file to check its schema
-for data in csv_files:
-    # Read the CSV file to get its schema
-    data_schema = spark.read.format("csv")\
-        .option("header", "true")\
-        .load(data).columns
-    
-    # Log the schema of the current file
-    logger.info(f"Schema of the file {data} is: {data_schema}")
-    logger.info(f"Required columns are: {config.mandatory_columns}")
-    
-    # Determine any missing required columns
-    missing_columns = set(config.mandatory_columns) - set(data_schema)
-    logger.info(f"Missing columns in the file {data} are: {missing_columns}")
-
-    # If there are missing columns, add the file to error_files
-    if missing_columns:
-        error_files.append(data)
-    else:
-        # If all required columns are present, add the file to correct_files
-        logger.info(f"File {data} has all the required columns.")
-        correct_files.append(data)
+correct_files = schema_check["correct"] + schema_check["extra"]
+error_files.extend(schema_check["missing"])
+
+# Every stage below records a checkpoint for this batch of files.
+# If an earlier run left a batch unfinished, this run resumes exactly that
+# batch and leaves any newer files for the next run.
+etag_by_name = {os.path.basename(obj["key"]): obj["etag"] for obj in s3_objects}
+available_files = {os.path.basename(file): etag_by_name.get(os.path.basename(file)) for file in correct_files}
+PipelineCheckpoint.remove_stale(config.checkpoint_directory, etag_by_name)
+pending_files = PipelineCheckpoint.find_pending(config.checkpoint_directory, available_files)
+if pending_files:
+    logger.info(f"Resuming the unfinished batch of the last run with files {list(pending_files)}")
+    correct_files = [file for file in correct_files if os.path.basename(file) in pending_files]
+    available_files = pending_files
+checkpoint = PipelineCheckpoint(config.checkpoint_directory, available_files)
 
 # Log the files with correct schemas
 logger.info(f"*****************Correct files*****************- {correct_files}")
@@ -179,25 +235,38 @@ else:
 # Move the error files to the error folder locally
 error_folder_local_path = config.error_folder_path_local
 if error_files:
+    error_keys = []
     for file in error_files:
-        # Check if the error folder exists
-        if os.path.exists(error_folder_local_path):
-            # Determine the file name and destination path
-            file_name = os.path.basename(file)
+        file_name = os.path.basename(file)
+        if config.ingestion_mode == "s3a":
+            # Nothing was downloaded, the file only needs to move inside S3
+            pass
+        elif os.path.exists(error_folder_local_path):
+            # Determine the destination path
             destination_path = os.path.join(error_folder_local_path, file_name)
             
             # Move the error file to the local error folder
             shutil.move(file, destination_path)
             logger.info(f"Error file {file} moved from S3 Downloads to the {destination_path} folder.")
-            
-            # Move the file in S3 from source directory to error directory
-            source_prefix = config.s3_source_directory
-            destination_prefix = config.s3_error_directory
-            message = move_files(s3_client, config.bucket_name, source_prefix, destination_prefix, file_name)
-            logger.info(f"{message}")
         else:
             # Log an error if the error folder does not exist
             logger.error(f"File {file} not moved to the error folder as the folder does not exist.")
+            continue
+        if file in key_by_file:
+            error_keys.append(key_by_file[file])
+        else:
+            # Left in the local directory by an earlier run, not part of this listing
+            logger.info(f"Error file {file} is not in the source folder, nothing to move in S3.")
+
+    # Move all error files in S3 from source directory to error directory in one batch
+    if error_keys:
+        source_prefix = config.s3_source_directory
+        destination_prefix = config.s3_error_directory
+        with stage_metrics.stage("error_files_moved") as stage:
+            message = move_s3_to_s3(s3_client, config.bucket_name, source_prefix, destination_prefix,
+                                    keys=error_keys)
+            stage.rows_in = len(error_keys)
+        logger.info(f"{message}")
 else:
     logger.info("*****************No error files found. Proceeding further.*****************")
 
@@ -206,288 +275,402 @@ else:
 # Before running the process,
 # Stage table needs to be updated with the file name and status as 'I' or 'A'
 logger.info("*****************Updating the staging table*****************")
-insert_statements = []
-db_name = config.database_name
 current_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-if correct_files:
-    for files in correct_files:
-        # Determine the file name
-        filename = os.path.basename(files)
-        
-        # Create the insert statement for the staging table
-        statement = f"""INSERT INTO {db_name}.{config.product_staging_table}
-        (file_name, file_location, created_date, status)
-        VALUES ('{filename}', '{filename}' , '{current_date}' , 'A');"""
-        insert_statements.append(statement)
-        logger.info(f"Insert statement created: {statement}")
-        
-        # Connect to MySQL server
-        logger.info("*****************Connecting to MySQL Server*****************")
-        connection = get_mysql_connection()
-        cursor = connection.cursor()
-        logger.info("*****************Connected to MySQL Server*****************")
-        
-        # Execute the insert statements
-        for statement in insert_statements:
-            cursor.execute(statement)
-            connection.commit()
-            logger.info(f"Data inserted into the table {config.product_staging_table} successfully.")
-        
-        # Close the cursor and connection
-        cursor.close()
-        connection.close()
-else:
+if not correct_files:
     # Log an error and raise an exception if no files are found to process
     logger.error("No files to process. Exiting the process.")
     raise Exception("No files to process. Exiting the process.")
+elif checkpoint.is_complete("staging_table_inserted"):
+    logger.info("Staging table rows already inserted by the last run.")
+else:
+    # One executemany insert in a single transaction for the whole batch
+    with stage_metrics.stage("staging_table_inserted") as stage:
+        staging_table.insert_files([os.path.basename(file) for file in correct_files], 'A', current_date)
+        stage.rows_out = len(correct_files)
+    checkpoint.mark_complete("staging_table_inserted")
 
 logger.info("***************** Staging table updated successfully. *****************")
-logger.info("***************** Fixing extra columns coming from source. *****************")
+# Small batches run on the single machine Arrow engine, no JVM or SparkSession is started.
+# Everything else goes through Spark.
+size_by_name = {os.path.basename(obj["key"]): obj["size"] for obj in s3_objects}
+batch_input_bytes = sum(size_by_name.get(os.path.basename(file), 0) for file in correct_files)
+use_arrow_engine = config.execution_engine == "arrow" or \
+    (config.execution_engine == "auto" and batch_input_bytes <= config.arrow_engine_max_input_bytes)
+logger.info(f"Batch input is {batch_input_bytes} bytes, running on the "
+            f"{'arrow' if use_arrow_engine else 'spark'} engine")
 
-# Define schema for the DataFrame
-schema = StructType([
-    StructField("customer_id", IntegerType(), True),
-    StructField("store_id", IntegerType(), True),
-    StructField("product_name", StringType(), True),
-    StructField("sales_date", DateType(), True),
-    StructField("sales_person_id", IntegerType(), True),
-    StructField("price", FloatType(), True), 
-    StructField("quantity", IntegerType(), True),
-    StructField("total_cost", FloatType(), True),
-    StructField("additional_column", StringType(), True)
-])
-
-logger.info("*****************Creating empty dataframe.*****************")
-
-final_df_to_process = spark.createDataFrame([], schema)
-final_df_to_process.show()
-# Process each file in correct_files
-for data in correct_files:
-    # Read the CSV file into a DataFrame
-    data_df = spark.read.format("csv")\
-        .option("header", "true")\
-        .option("inferSchema", "true")\
-        .load(data)
-    # Get the columns of the current DataFrame
-    data_schema = data_df.columns
-    # Identify extra columns that are not in the mandatory columns list
-    extra_columns = list(set(data_schema) - set(config.mandatory_columns))
-    # Log the extra columns found in the current file
-    logger.info(f"Extra columns in the file {data} at source are: {extra_columns}")
-    # Check if there are any extra columns
-    if extra_columns:
-        # Concatenate the values of extra columns into a single string and add it as 'additional_column'
-        data_df = data_df.withColumn("additional_column", concat_ws(", ", *extra_columns))\
-        .select("customer_id", "store_id", "product_name", "sales_date", "sales_person_id", "price", "quantity", "total_cost", "additional_column")
-        # Log the processing of the current file
-        logger.info(f"Processed {data} and added a new column with concatenated values of extra columns.")
+logger.info("***************** Fixing extra columns coming from source. *****************")
+correct_file_headers = {file: file_headers[file] for file in correct_files}
+
+# The dimension tables do not depend on each other, loaders that do their reads
+# eagerly run concurrently. Returns the customer, store and sales team tables.
+def load_dimensions(load_dimension, concurrent=True):
+    dimension_loads = DagScheduler(config.dag_max_concurrency if concurrent else 1, name="dimension_loads")
+    for table_name, columns in ((config.customer_table_name, customer_columns),
+                                (config.store_table, store_columns),
+                                (config.sales_team_table, sales_team_columns)):
+        dimension_loads.add_stage(table_name,
+                                  lambda table_name=table_name, columns=columns: load_dimension(table_name, columns))
+    loaded = dimension_loads.run()
+    stage_metrics.annotate("dimension_loads", dimension_loads.report())
+    return loaded[config.customer_table_name], loaded[config.store_table], loaded[config.sales_team_table]
+
+# Shared intermediates of the Spark path are persisted here and released by their last consumer
+dataframe_cache = DataFrameCache(config.dataframe_cache_storage_level)
+
+if use_arrow_engine:
+    if config.ingestion_mode == "s3a":
+        from pyarrow.fs import S3FileSystem
+        engine = ArrowEngine(S3FileSystem(access_key=decrypt(aws_access_key), secret_key=decrypt(aws_secret_key),
+                                          endpoint_override=config.s3_endpoint_url))
     else:
-        # If no extra columns, add 'additional_column' with None values
-        data_df = data_df.withColumn("additional_column", lit(None))\
-        .select("customer_id", "store_id", "product_name", "sales_date", "sales_person_id", "price", "quantity", "total_cost", "additional_column")
-        # Log the processing of the current file
-        logger.info(f"Processed {data} and added a new column with None values.")
-
-    # Append the processed DataFrame to the final DataFrame
-    final_df_to_process = final_df_to_process.union(data_df)
-
-# Log the final DataFrame that will be processed
-logger.info("***************** Final dataframe from source which will be processed: *****************")
-final_df_to_process.show()
-
-# Enrich the data from all dimension tables
-# Also create a datamart for the sales team including their incentives, addresses, and more.
-# Another datamart for customers indicating how many products they bought on each day of the month.
-# For every month, generate a file with store_id segregation.
-# Read the data from Parquet and generate a CSV file.
-# The CSV will include: sales_person_name, sales_person_store_id, 
-# sales_person_total_billing_done_for_the_month, total_incentive.
-
-# Connect with DatabaseReader
-database_client = DatabaseReader(config.url, config.properties)
-
-# Create DataFrames for all tables
-# Customer Table
-logger.info("Loading the customer table into a customer_table_df.")
-customer_table_df = database_client.create_dataframe(spark, config.customer_table_name)
-
-# Product Table
-logger.info("Loading the product table into a product_table_df.")
-product_table_df = database_client.create_dataframe(spark, config.product_table)
-
-# Product Staging Table
-logger.info("Loading the product staging table into a product_staging_table_df.")
-product_staging_table_df = database_client.create_dataframe(spark, config.product_staging_table)
-
-# Sales Team Table
-logger.info("Loading the sales team table into a sales_team_table_df.")
-sales_team_table_df = database_client.create_dataframe(spark, config.sales_team_table)
-
-# Store Table
-logger.info("Loading the store table into a store_table_df.")
-store_table_df = database_client.create_dataframe(spark, config.store_table)
-
-# Joining dimension tables
-s3_customer_store_sales_df_join = dimesions_table_join(final_df_to_process, customer_table_df, store_table_df, sales_team_table_df)
-
-logger.info("*****************Final enriched info*****************")
-s3_customer_store_sales_df_join.show()
-
-#Write the customers data into customer_data_mart
-#file will be written to local first
+        engine = ArrowEngine()
+
+    # Same stages as the Spark path, checkpointed as parquet as well
+    with stage_metrics.stage("parsed_input") as stage:
+        final_df_to_process = checkpoint.materialize(
+            "parsed_input",
+            lambda: engine.read_sales_data(correct_file_headers, config.mandatory_columns),
+            engine.write_parquet, engine.read_parquet)
+        stage.bytes_read = batch_input_bytes
+        stage.rows_out = final_df_to_process.num_rows
+
+    with stage_metrics.stage("enriched_join") as stage:
+        s3_customer_store_sales_df_join = checkpoint.materialize(
+            "enriched_join",
+            lambda: engine.dimensions_join(final_df_to_process, *load_dimensions(engine.load_dimension)),
+            engine.write_parquet, engine.read_parquet)
+        stage.rows_in = final_df_to_process.num_rows
+        stage.rows_out = s3_customer_store_sales_df_join.num_rows
+    logger.info(f"Enriched {s3_customer_store_sales_df_join.num_rows} rows without Spark")
+
+    final_customer_data_mart_df = engine.customer_detail(s3_customer_store_sales_df_join)
+    # The Arrow marts aggregate the detail tables directly, there is no rollup stage
+    build_mart_inputs = None
+    final_sales_team_data_mart_df = engine.sales_detail(s3_customer_store_sales_df_join)
+
+    write_customer_data_mart = lambda: engine.write_parquet(final_customer_data_mart_df,
+                                                            config.customer_data_mart_local_file)
+    write_sales_team_data_mart = lambda: engine.write_parquet(final_sales_team_data_mart_df,
+                                                              config.sales_team_data_mart_local_file)
+    write_sales_team_partitioned = lambda: engine.write_partitioned(final_sales_team_data_mart_df,
+                                                                    config.sales_team_data_mart_partitioned_local_file,
+                                                                    ["sales_month", "store_id"])
+    mart_upserter = MartUpserter(config.database_name)
+    write_customer_mart_table = lambda: mart_upserter.upsert_customer_mart(
+        config.customer_data_mart_table, config.customer_data_mart_stage_table, checkpoint.batch_id,
+        lambda stage_table: engine.write_mysql(engine.customer_mart(final_customer_data_mart_df), stage_table))
+    write_sales_mart_table = lambda: mart_upserter.upsert_sales_team_mart(
+        config.sales_team_data_mart_table, config.sales_team_data_mart_stage_table, checkpoint.batch_id,
+        lambda stage_table: engine.write_mysql(engine.sales_mart_totals(final_sales_team_data_mart_df),
+                                               stage_table))
+else:
+    # Initialize and create a Spark session
+    logger.info("*****************Creating a spark session*****************")
+    spark = spark_session(batch_input_bytes)
+    if config.ingestion_mode == "s3a":
+        configure_s3a(spark, decrypt(aws_access_key), decrypt(aws_secret_key), config.s3_endpoint_url)
+    logger.info("*****************Spark session created.*****************")
+
+    # Files are grouped by their header and each group is read with one
+    # load([...]) call using the explicit schema, extra columns are folded
+    # into additional_column
+    def parse_input():
+        logger.info(f"Reading {len(correct_files)} files in {len(group_files_by_header(correct_file_headers))} header groups")
+        return read_sales_data(spark, correct_file_headers, config.mandatory_columns)
+
+    # With the source file cache the parsed files already have a parquet copy, the
+    # checkpoint only records their cache paths instead of writing the batch again
+    def cache_input():
+        logger.info(f"Reading {len(correct_files)} files in {len(group_files_by_header(correct_file_headers))} header groups")
+        # Files are identified by their S3 ETag so retries and backfills reuse the parquet copy
+        content_keys = {file: etag_by_name.get(os.path.basename(file)) or compute_s3_etag(file)
+                        for file in correct_files}
+        source_cache = SourceFileCache(config.source_cache_directory, config.source_cache_max_bytes)
+        return cache_sales_data(spark, correct_file_headers, config.mandatory_columns, source_cache, content_keys)
+
+    # Rows are not counted on the Spark path, every count would be an extra Spark job
+    with stage_metrics.stage("parsed_input") as stage:
+        if config.source_cache_enabled:
+            parsed_input_paths = checkpoint.reference("parsed_input", cache_input)
+            final_df_to_process = read_cached_sales_data(spark, parsed_input_paths)
+        else:
+            final_df_to_process = checkpoint.dataframe(spark, "parsed_input", parse_input)
+            parsed_input_paths = [checkpoint.stage_path("parsed_input")]
+        parsed_input_bytes = sum(path_size(path) for path in parsed_input_paths)
+        stage.bytes_read = batch_input_bytes
+        stage.bytes_written = parsed_input_bytes
+
+    # Log the final DataFrame that will be processed
+    logger.info("***************** Final dataframe from source which will be processed: *****************")
+    preview(final_df_to_process, "final_df_to_process")
+
+    # Enrich the data from all dimension tables
+    # Also create a datamart for the sales team including their incentives, addresses, and more.
+    # Another datamart for customers indicating how many products they bought on each day of the month.
+    # For every month, generate a file with store_id segregation.
+    # Read the data from Parquet and generate a CSV file.
+    # The CSV will include: sales_person_name, sales_person_store_id, 
+    # sales_person_total_billing_done_for_the_month, total_incentive.
+    def enrich_input():
+        # Connect with DatabaseReader
+        database_client = DatabaseReader(config.url, config.properties)
+
+        # Dimension tables are loaded lazily, only the ones used by the joins are fetched.
+        # With the dimension cache they come from a local snapshot while MySQL is unchanged.
+        if config.dimension_cache_enabled:
+            dimension_cache = DimensionCache(spark, database_client, config.dimension_cache_directory,
+                                             config.dimension_cache_ttl_seconds, config.dimension_change_detection,
+                                             config.dimension_cache_max_age_seconds)
+            load_dimension = dimension_cache.get
+        else:
+            load_dimension = lambda table_name, columns: database_client.create_dataframe(spark, table_name,
+                                                                                          columns=columns)
+
+        # Snapshot refreshes read MySQL and write Parquet eagerly, so the cached tables are
+        # loaded concurrently. Plain JDBC DataFrames are lazy, their reads run in the join job.
+        logger.info("Loading the customer, sales team and store tables.")
+        customer_table_df, store_table_df, sales_team_table_df = load_dimensions(
+            load_dimension, concurrent=config.dimension_cache_enabled)
+
+        # Joining dimension tables, each side is pruned to the columns the data marts
+        # need and small dimensions are broadcast
+        return dimesions_table_join(final_df_to_process, customer_table_df, store_table_df, sales_team_table_df,
+                                    row_counts=database_client.row_counts)
+
+    with stage_metrics.stage("enriched_join") as stage:
+        s3_customer_store_sales_df_join = checkpoint.dataframe(spark, "enriched_join", enrich_input)
+        stage.bytes_read = parsed_input_bytes
+        stage.bytes_written = path_size(checkpoint.stage_path("enriched_join"))
+
+    # The enriched join is read back from its checkpoint, the local mart writes and the
+    # rollup each scan that Parquet instead of sharing a persisted copy in executor memory
+
+    logger.info("*****************Final enriched info*****************")
+    preview(s3_customer_store_sales_df_join, "enriched join")
+
+    #Write the customers data into customer_data_mart
+    #file will be written to local first
+    #Move the RAW data to S3 bucket for reporting tool
+    #Write reporting data into SQL table also
+    logger.info("*****************Writing the data into the final_customer_data_mart_df*****************")
+    final_customer_data_mart_df = s3_customer_store_sales_df_join\
+        .select("customer_id",
+                "first_name",
+                "last_name",
+                "address",
+                "pincode",
+                "phone_number",
+                "sales_date",
+                "total_cost")
+    logger.info("*****************Final data customer data mart*****************")
+    preview(final_customer_data_mart_df, "customer data mart")
+
+    #Sales team data mart
+    logger.info("*****************Write data into sales team data mart*****************")
+    final_sales_team_data_mart_df = s3_customer_store_sales_df_join\
+                                    .select("store_id",
+                                            "sales_person_id",
+                                            "sales_person_first_name",
+                                            "sales_person_last_name",
+                                            "store_manager_name",
+                                            "manager_id",
+                                            "is_manager",
+                                            "sales_person_address",
+                                            "sales_person_pincode",
+                                            "sales_date",
+                                            "total_cost",
+                                            expr("SUBSTRING(sales_date, 1, 7) as sales_month"))
+
+    logger.info("*****************Final data sales team data mart*****************")
+    preview(final_sales_team_data_mart_df, "sales team data mart")
+    parquet_writer = ParquetWriter("overwrite", "parquet")
+    write_customer_data_mart = lambda: parquet_writer.dataframe_writer(final_customer_data_mart_df,
+                                                                       config.customer_data_mart_local_file)
+    write_sales_team_data_mart = lambda: parquet_writer.dataframe_writer(final_sales_team_data_mart_df,
+                                                                         config.sales_team_data_mart_local_file)
+    write_sales_team_partitioned = lambda: final_sales_team_data_mart_df.write.format("parquet")\
+                                .option("header", "true")\
+                                .partitionBy("sales_month", "store_id")\
+                                .mode("overwrite")\
+                                .option("path", config.sales_team_data_mart_partitioned_local_file)\
+                                .save()
+    # Both data marts are derived from one (customer, store, sales person, month)
+    # rollup, the detail rows are shuffled once and the small rollup is kept.
+    # It is persisted for the mart table writes this run still has to do and
+    # released after the last one.
+    mart_inputs = {}
+    rollup_consumers = [stage for stage in ("customer_mart_table_written", "sales_mart_table_written")
+                        if not checkpoint.is_complete(stage)]
+
+    def build_mart_inputs():
+        with stage_metrics.stage("sales_rollup") as stage:
+            sales_rollup_df = checkpoint.dataframe(spark, "sales_rollup",
+                                                   lambda: build_sales_rollup(s3_customer_store_sales_df_join))
+            stage.bytes_written = path_size(checkpoint.stage_path("sales_rollup"))
+            mart_inputs["sales_rollup"] = dataframe_cache.persist("sales_rollup", sales_rollup_df,
+                                                                  len(rollup_consumers))
+
+    write_customer_mart_table = dataframe_cache.consumer(
+        "sales_rollup",
+        lambda: customer_mart_calculation_table_write(mart_inputs["sales_rollup"], checkpoint.batch_id))
+    write_sales_mart_table = dataframe_cache.consumer(
+        "sales_rollup",
+        lambda: sales_mart_calculation_table_write(mart_inputs["sales_rollup"], checkpoint.batch_id))
+
+# The rest of the batch is a graph of stages. Independent stages (the local mart
+# writes, their uploads, the MySQL mart writes and the local cleanup) run
+# concurrently within dag_max_concurrency. A stage the checkpoint already
+# records as complete is skipped.
+def checkpointed(stage_name, work):
+    def run():
+        if checkpoint.is_complete(stage_name):
+            logger.info(f"Stage {stage_name} already completed by the last run.")
+            return
+        with stage_metrics.stage(stage_name) as stage:
+            details = work(stage) or {}
+        checkpoint.mark_complete(stage_name, **details)
+    return run
+
+#Write the mart data to local parquet first
+def write_local(write, local_file):
+    def work(stage):
+        write()
+        stage.bytes_written = path_size(local_file)
+        logger.info(f"*****************Data written to the local file at {local_file}*****************")
+        return {"path": local_file}
+    return work
+
 #Move the RAW data to S3 bucket for reporting tool
-#Write reporting data into SQL table also
-logger.info("*****************Writing the data into the final_customer_data_mart_df*****************")
-final_customer_data_mart_df = s3_customer_store_sales_df_join\
-    .select("ct.customer_id",
-            "ct.first_name",
-            "ct.last_name",
-            "ct.address",
-            "ct.pincode",
-            "phone_number",
-            "sales_date",
-            "total_cost")
-logger.info("*****************Final data customer data mart*****************")
-final_customer_data_mart_df.show()
-
-parquet_writer = ParquetWriter("overwrite", "parquet")
-parquet_writer.dataframe_writer(final_customer_data_mart_df, config.customer_data_mart_local_file)
-
-logger.info(f"*****************Data written to the local file at {config.customer_data_mart_local_file}*****************")
-
-#Move the data to S3 bucket
-logger.info("*****************Moving the data to S3 bucket*****************")
 s3_uploader = UploadToS3(s3_client)
-s3_directory = config.s3_customer_datamart_directory
-message = s3_uploader.upload_to_s3(s3_directory, config.bucket_name, config.customer_data_mart_local_file)
-logger.info(f"{message}")
+
+def upload_local(s3_directory, local_file):
+    def work(stage):
+        message = s3_uploader.upload_to_s3(s3_directory, config.bucket_name, local_file)
+        stage.bytes_read = path_size(local_file)
+        logger.info(f"{message}")
+        return {"s3_directory": s3_directory}
+    return work
+
+def upload_sales_partitioned(stage):
+    s3_prefix = "sales_partitioned_data_mart"
+    current_epoch = int(datetime.datetime.now().timestamp()) * 1000
+    manifest = s3_uploader.upload_directory(config.sales_team_data_mart_partitioned_local_file,
+                                            config.bucket_name, f"{s3_prefix}/{current_epoch}")
+    stage.rows_out = len(manifest)
+    stage.bytes_read = sum(entry["size"] for entry in manifest)
+    return {"s3_prefix": f"{s3_prefix}/{current_epoch}", "file_count": len(manifest)}
+
+#Write reporting data into SQL table also
+def write_mart_table(write, description):
+    def work(stage):
+        logger.info(f"Calculating {description}.")
+        write()
+        logger.info("Calculation done and written to the MySQL table.")
+    return work
+
+def update_staging_table(stage):
+    # A single UPDATE ... WHERE file_name IN (...) for the whole batch
+    staging_table.update_status([os.path.basename(file) for file in correct_files], 'I', current_date)
+    stage.rows_out = len(correct_files)
+
+# Move the processed files of this batch to the 'processed' folder in the S3 bucket
+def move_source_files(stage):
+    processed_keys = [key_by_file[file] for file in correct_files if file in key_by_file]
+    message = move_s3_to_s3(s3_client, config.bucket_name, config.s3_source_directory,
+                            config.s3_processed_directory, keys=processed_keys)
+    stage.rows_in = len(processed_keys)
+    logger.info(f"{message}")
+
+def delete_local(local_path):
+    def run():
+        logger.info(f"*****************Deleting {local_path} from local*****************")
+        delete_local_file(local_path)
+        logger.info(f"*****************Deleted {local_path} from local*****************")
+    return run
+
+pipeline = DagScheduler(config.dag_max_concurrency, name="batch_pipeline")
+
+#Customer data mart
+pipeline.add_stage("customer_mart_written",
+                   checkpointed("customer_mart_written",
+                                write_local(write_customer_data_mart, config.customer_data_mart_local_file)))
+pipeline.add_stage("customer_mart_uploaded",
+                   checkpointed("customer_mart_uploaded",
+                                upload_local(config.s3_customer_datamart_directory,
+                                             config.customer_data_mart_local_file)),
+                   depends_on=["customer_mart_written"])
 
 #Sales team data mart
-logger.info("*****************Write data into sales team data mart*****************")
-final_sales_team_data_mart_df = s3_customer_store_sales_df_join\
-                                .select("store_id",
-                                        "sales_person_id",
-                                        "sales_person_first_name",
-                                        "sales_person_last_name",
-                                        "store_manager_name",
-                                        "manager_id",
-                                        "is_manager",
-                                        "sales_person_address",
-                                        "sales_person_pincode",
-                                        "sales_date",
-                                        "total_cost",
-                                        expr("SUBSTRING(sales_date, 1, 7) as sales_month"))
-
-logger.info("*****************Final data sales team data mart*****************")
-final_sales_team_data_mart_df.show()
-parquet_writer.dataframe_writer(final_sales_team_data_mart_df, config.sales_team_data_mart_local_file)
-logger.info(f"*****************sales team data written to the local file at {config.sales_team_data_mart_local_file}*****************")
-
-s3_directory = config.s3_sales_datamart_directory
-message = s3_uploader.upload_to_s3(s3_directory, config.bucket_name, config.sales_team_data_mart_local_file)
-logger.info(f"{message}")
+pipeline.add_stage("sales_mart_written",
+                   checkpointed("sales_mart_written",
+                                write_local(write_sales_team_data_mart, config.sales_team_data_mart_local_file)))
+pipeline.add_stage("sales_mart_uploaded",
+                   checkpointed("sales_mart_uploaded",
+                                upload_local(config.s3_sales_datamart_directory,
+                                             config.sales_team_data_mart_local_file)),
+                   depends_on=["sales_mart_written"])
 
 #Also writing the data info partitioned data
-final_sales_team_data_mart_df.write.format("parquet")\
-                            .option("header", "true")\
-                            .partitionBy("sales_month", "store_id")\
-                            .mode("overwrite")\
-                            .option("path", config.sales_team_data_mart_partitioned_local_file)\
-                            .save()
-
-s3_prefix = "sales_partitioned_data_mart"
-current_epoch = int(datetime.datetime.now().timestamp()) * 1000
-for root, dirs, files in os.walk(config.sales_team_data_mart_partitioned_local_file):
-    for file in files:
-        print(file)
-        local_file_path = os.path.join(root, file)
-        relative_file_path = os.path.relpath(local_file_path, config.sales_team_data_mart_partitioned_local_file)
-        s3_key = f"{s3_prefix}/{current_epoch}/{relative_file_path}"
-        s3_client.upload_file(local_file_path, config.bucket_name, s3_key)
+pipeline.add_stage("sales_partitioned_written",
+                   checkpointed("sales_partitioned_written",
+                                write_local(write_sales_team_partitioned,
+                                            config.sales_team_data_mart_partitioned_local_file)))
+pipeline.add_stage("sales_partitioned_uploaded",
+                   checkpointed("sales_partitioned_uploaded", upload_sales_partitioned),
+                   depends_on=["sales_partitioned_written"])
 
 #Calculation for data mart
 #Find out the customers total purchases in a month
-#Write the result into MySQL table
-logger.info("Calculating the total purchases of customers in a month.")
-customer_mart_calculation_table_write(final_customer_data_mart_df)
-logger.info("Calculation done and written to the MySQL table.")
-
-# Calculation for sales team mart
-
-# Calculate the total sales done by each sales person in a month
-logger.info("Calculating the total sales done by each sales person in a month.")
-
-# Write the result into a MySQL table
-# The top-performing sales person of the month will receive a 1% incentive
-# The rest of the sales team members receive no incentive
-sales_mart_calculation_table_write(final_sales_team_data_mart_df)
-logger.info("Calculation done and written to the MySQL table.")
-
-# Move the processed files to the 'processed' folder in the S3 bucket
-source_prefix = config.s3_source_directory
-destination_prefix = config.s3_processed_directory
-message = move_s3_to_s3(s3_client, config.bucket_name, source_prefix, destination_prefix)
-logger.info(f"{message}")
-
-# Delete downloaded files from the local directory
-logger.info("*****************Deleting downloaded files from local.*****************")
-delete_local_file(config.local_directory)
-logger.info("*****************Files deleted from local.*****************")
-
-# Delete customer_data_mart_local_file from the local directory
-logger.info("*****************Deleting customer_data_mart_local_file from local*****************")
-delete_local_file(config.customer_data_mart_local_file)
-logger.info("*****************Deleted customer_data_mart_local_file from local*****************")
-
-# Delete sales team data mart file from the local directory
-logger.info("*****************Deleting sales team data from local*****************")
-delete_local_file(config.sales_team_data_mart_local_file)
-logger.info("*****************Deleted sales team data from local*****************")
-
-# Delete sales team partitioned data file from the local directory
-logger.info("*****************Deleting sales team partitioned data from local*****************")
-delete_local_file(config.sales_team_data_mart_partitioned_local_file)
-logger.info("*****************Deleted sales team partitioned data from local*****************")
-
-
-# Update the status of the staging table
-update_statements = []
-
-# If there are correct files to process
-if correct_files:
-    # Create update statements for each correct file
-    for file in correct_files:
-        filename = os.path.basename(file)
-        statement = f"""
-                    UPDATE {db_name}.{config.product_staging_table}
-                    SET status = 'I', updated_date = '{current_date}'
-                    WHERE file_name = '{filename}';
-                    """
-        update_statements.append(statement)
-    
-    # Log the created update statements
-    logger.info(f"Update statements created: {update_statements}")
-    
-    # Connect to the MySQL Server
-    logger.info("*****************Connecting to MySQL Server*****************")
-    connection = get_mysql_connection()
-    cursor = connection.cursor()
-    logger.info("*****************Connected to MySQL Server*****************")
-    
-    # Execute each update statement and commit the changes
-    for statement in update_statements:
-        cursor.execute(statement)
-        connection.commit()
-        logger.info(f"Data updated in the table {config.product_staging_table} successfully.")
-    
-    # Close the cursor and connection
-    cursor.close()
-    connection.close()
-else:
-    # Log an error if there are no correct files to process
-    logger.error("There has been an error in updating the status of the staging table.")
-    sys.exit()
+#The top-performing sales person of the month will receive a 1% incentive
+mart_table_dependencies = []
+if build_mart_inputs is not None:
+    pipeline.add_stage("sales_rollup", build_mart_inputs)
+    mart_table_dependencies = ["sales_rollup"]
+pipeline.add_stage("customer_mart_table_written",
+                   checkpointed("customer_mart_table_written",
+                                write_mart_table(write_customer_mart_table,
+                                                 "the total purchases of customers in a month")),
+                   depends_on=mart_table_dependencies)
+pipeline.add_stage("sales_mart_table_written",
+                   checkpointed("sales_mart_table_written",
+                                write_mart_table(write_sales_mart_table,
+                                                 "the total sales done by each sales person in a month")),
+                   depends_on=mart_table_dependencies)
+
+# Update the status of the staging table before the source files are moved. If the
+# move fails part way, the next run moves the files still in the source folder
+pipeline.add_stage("staging_table_updated",
+                   checkpointed("staging_table_updated", update_staging_table),
+                   depends_on=["customer_mart_uploaded", "sales_mart_uploaded", "sales_partitioned_uploaded",
+                               "customer_mart_table_written", "sales_mart_table_written"])
+pipeline.add_stage("source_files_moved",
+                   checkpointed("source_files_moved", move_source_files),
+                   depends_on=["staging_table_updated"])
+
+# Once the source files are moved no rerun can find this batch again,
+# its checkpoint and the parquet copies of the stages are removed right away
+pipeline.add_stage("checkpoint_cleared", checkpoint.clear, depends_on=["source_files_moved"])
+
+# Local copies are deleted as soon as nothing reads them any more
+pipeline.add_stage("downloaded_files_deleted", delete_local(config.local_directory),
+                   depends_on=["staging_table_updated"])
+pipeline.add_stage("customer_mart_local_deleted", delete_local(config.customer_data_mart_local_file),
+                   depends_on=["customer_mart_uploaded"])
+pipeline.add_stage("sales_mart_local_deleted", delete_local(config.sales_team_data_mart_local_file),
+                   depends_on=["sales_mart_uploaded"])
+pipeline.add_stage("sales_partitioned_local_deleted",
+                   delete_local(config.sales_team_data_mart_partitioned_local_file),
+                   depends_on=["sales_partitioned_uploaded"])
 
-# Wait for user input to exit
-input("Press Enter to exit...")
\ No newline at end of file
+try:
+    pipeline.run()
+finally:
+    stage_metrics.annotate("batch_pipeline", pipeline.report())
+    # Entries whose consumers did not all run (a failed stage)
+    dataframe_cache.release_all()
+
+# Wait for user input to exit, unattended runs (e.g. the benchmark) turn this off
+if config.wait_for_exit_prompt:
+    input("Press Enter to exit...")
@@ -0,0 +1,12 @@
+import importlib
+import os
+
+#Settings of an environment, resources/<environment>/config.py.
+#The environment defaults to the ETL_ENV variable and then to dev.
+def load_config(environment=None):
+    environment = environment or os.environ.get("ETL_ENV", "dev")
+    return importlib.import_module(f"resources.{environment}.config")
+
+
+#Every module reads its settings through this one profile
+config = load_config()
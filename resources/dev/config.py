@@ -46,3 +46,130 @@ customer_data_mart_local_file = "C:\\Users\\shrey\\Documents\\project\\spark_dat
 sales_team_data_mart_local_file = "C:\\Users\\shrey\\Documents\\project\\spark_data\\sales_team_data_mart\\"
 sales_team_data_mart_partitioned_local_file = "C:\\Users\\shrey\\Documents\\project\\spark_data\\sales_partition_data\\"
 error_folder_path_local = "C:\\Users\\shrey\\Documents\\project\\spark_data\\error_files\\"
+
+# S3 listing
+s3_list_page_size = 1000
+s3_list_max_workers = 8
+s3_list_fan_out = False
+
+# S3 transfers
+s3_download_max_workers = 16
+s3_multipart_threshold_mb = 64
+s3_multipart_chunksize_mb = 16
+s3_transfer_max_concurrency = 4
+
+# Source ingestion
+# "local" downloads every file to local_directory first,
+# "s3a" hands the S3 keys straight to the Spark readers
+ingestion_mode = "local"
+# Set to a local S3 stand-in (e.g. moto server "http://localhost:5000") for testing
+s3_endpoint_url = None
+spark_s3a_packages = "org.apache.hadoop:hadoop-aws:3.3.4"
+s3_move_max_workers = 32
+s3_upload_max_workers = 16
+# Do not upload Spark _SUCCESS and .crc files next to the data mart output
+s3_upload_skip_spark_markers = True
+schema_check_max_workers = 32
+# Reads of one header before the schema check fails (transient S3 errors)
+schema_check_read_attempts = 3
+
+# Parsed source file cache (parquet copy of every validated CSV keyed by its ETag)
+source_cache_enabled = True
+source_cache_directory = "C:\\Users\\shrey\\Documents\\project\\spark_data\\source_file_cache\\"
+source_cache_max_bytes = 20 * 1024 * 1024 * 1024
+
+# Stage checkpoints used to resume a failed run
+checkpoint_directory = "C:\\Users\\shrey\\Documents\\project\\spark_data\\checkpoints\\"
+
+# MySQL connection pool used by the staging table and bookkeeping code
+mysql_host = "localhost"
+mysql_port = 3306
+mysql_pool_name = "etl_pool"
+# mysql-connector allows at most 32 connections per pool
+mysql_pool_size = 8
+# Seconds to wait for a free pooled connection
+mysql_pool_timeout = 30
+mysql_allow_local_infile = False
+
+# Partitioned JDBC reads of the dimension tables
+jdbc_partition_columns = {
+    customer_table_name: "customer_id",
+    product_table: "id",
+    product_staging_table: "id",
+    sales_team_table: "id",
+    store_table: "id"
+}
+jdbc_num_partitions = 8
+jdbc_fetch_size = 10000
+jdbc_min_rows_per_partition = 100000
+
+# Local snapshots of the dimension tables
+dimension_cache_enabled = True
+dimension_cache_directory = "C:\\Users\\shrey\\Documents\\project\\spark_data\\dimension_cache\\"
+dimension_cache_ttl_seconds = 15 * 60
+# A snapshot older than this is reloaded whatever the change detection says,
+# the count method does not see updates to existing rows (e.g. an address change)
+dimension_cache_max_age_seconds = 24 * 60 * 60
+# How a changed table is detected once the TTL expired: count, updated or checksum
+dimension_change_detection = {
+    customer_table_name: {"method": "count", "key_column": "customer_id"},
+    product_table: {"method": "updated", "updated_column": "updated_date"},
+    sales_team_table: {"method": "checksum"},
+    store_table: {"method": "checksum"}
+}
+
+# Dimensions estimated below this size are broadcast to the fact rows
+broadcast_join_threshold_bytes = 64 * 1024 * 1024
+
+# Execution engine: "spark", "arrow" or "auto" (arrow below arrow_engine_max_input_bytes)
+execution_engine = "auto"
+arrow_engine_max_input_bytes = 256 * 1024 * 1024
+
+# Bulk loading of the data marts into MySQL
+# "jdbc" for batched JDBC inserts, "load_data" for LOAD DATA LOCAL INFILE
+db_write_mode = "jdbc"
+db_write_batch_size = 10000
+db_write_parallelism = 4
+# Count the rows written to report rows/s (one extra Spark job per JDBC write, keep off in production)
+db_write_report_rows = False
+db_bulk_load_staging_directory = "C:\\Users\\shrey\\Documents\\project\\spark_data\\bulk_load\\"
+
+# Every batch is merged into the monthly data mart totals through these staging tables
+customer_data_mart_stage_table = "customers_data_mart_stage"
+sales_team_data_mart_stage_table = "sales_team_data_mart_stage"
+
+# Storage level of DataFrames shared by several stages (a pyspark StorageLevel name)
+dataframe_cache_storage_level = "MEMORY_AND_DISK"
+
+# Console previews of intermediate DataFrames, keep off in production
+diagnostics_enabled = False
+diagnostics_preview_rows = 20
+# Fraction sampled for previews of DataFrames that are not cached
+diagnostics_sample_fraction = 0.01
+
+# Spark session profile, qa and prod override these in their own config.py
+# (the environment is picked with the ETL_ENV variable)
+spark_master = "local[*]"
+spark_app_name = "shrey_sparks"
+spark_mysql_jar = "C:\\my_sql_jar\\mysql-connector-java-8.0.26.jar"
+# Shuffle partitions start at one per target size of input, within the bounds below
+spark_target_partition_bytes = 128 * 1024 * 1024
+spark_min_shuffle_partitions = 8
+spark_max_shuffle_partitions = 2000
+# Driver memory is the input size times the multiplier, within the bounds below
+spark_driver_memory_input_multiplier = 4
+spark_driver_memory_min_gb = 2
+spark_driver_memory_max_gb = 16
+spark_kryo_buffer_max = "512m"
+spark_extra_conf = {}
+# Maven packages added to the session, hadoop-aws is added on its own in s3a mode
+spark_packages = []
+
+# Per stage timings, rows and bytes of every run (JSON report and Prometheus text file)
+stage_metrics_directory = "C:\\Users\\shrey\\Documents\\project\\spark_data\\metrics\\"
+
+# Keep the console open at the end of a run, off for unattended runs
+wait_for_exit_prompt = True
+
+# Pipeline stages that do not depend on each other run concurrently, at most this many at a time
+dag_max_concurrency = 4
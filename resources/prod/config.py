@@ -0,0 +1,26 @@
+from resources.dev.config import *
+
+# Production cluster
+spark_master = "yarn"
+spark_app_name = "sales_data_pipeline"
+spark_mysql_jar = None
+spark_target_partition_bytes = 256 * 1024 * 1024
+spark_min_shuffle_partitions = 32
+spark_max_shuffle_partitions = 4000
+spark_driver_memory_min_gb = 4
+spark_driver_memory_max_gb = 64
+spark_kryo_buffer_max = "1g"
+spark_packages = ["com.mysql:mysql-connector-j:8.0.33"]
+
+# Local working directories on the Linux hosts, the dev profile paths are a Windows workstation
+spark_data_directory = "/data/spark_data/"
+local_directory = spark_data_directory + "file_from_s3/"
+customer_data_mart_local_file = spark_data_directory + "customer_data_mart/"
+sales_team_data_mart_local_file = spark_data_directory + "sales_team_data_mart/"
+sales_team_data_mart_partitioned_local_file = spark_data_directory + "sales_partition_data/"
+error_folder_path_local = spark_data_directory + "error_files/"
+source_cache_directory = spark_data_directory + "source_file_cache/"
+checkpoint_directory = spark_data_directory + "checkpoints/"
+dimension_cache_directory = spark_data_directory + "dimension_cache/"
+db_bulk_load_staging_directory = spark_data_directory + "bulk_load/"
+stage_metrics_directory = spark_data_directory + "metrics/"
@@ -0,0 +1,21 @@
+from resources.dev.config import *
+
+# QA runs the dev settings on a small cluster
+spark_master = "yarn"
+spark_mysql_jar = None
+spark_min_shuffle_partitions = 16
+spark_driver_memory_max_gb = 32
+spark_packages = ["com.mysql:mysql-connector-j:8.0.33"]
+
+# Local working directories on the Linux hosts, the dev profile paths are a Windows workstation
+spark_data_directory = "/data/spark_data/"
+local_directory = spark_data_directory + "file_from_s3/"
+customer_data_mart_local_file = spark_data_directory + "customer_data_mart/"
+sales_team_data_mart_local_file = spark_data_directory + "sales_team_data_mart/"
+sales_team_data_mart_partitioned_local_file = spark_data_directory + "sales_partition_data/"
+error_folder_path_local = spark_data_directory + "error_files/"
+source_cache_directory = spark_data_directory + "source_file_cache/"
+checkpoint_directory = spark_data_directory + "checkpoints/"
+dimension_cache_directory = spark_data_directory + "dimension_cache/"
+db_bulk_load_staging_directory = spark_data_directory + "bulk_load/"
+stage_metrics_directory = spark_data_directory + "metrics/"
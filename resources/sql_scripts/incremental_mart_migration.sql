@@ -0,0 +1,86 @@
+-- Migration of a database created before the incremental data mart merge.
+-- Run once against an existing database, table_scripts.sql already creates the new layout.
+-- Rows appended by the old jobs are summed per key, the old tables are kept as *_pre_merge.
+
+-- customer mart: yyyy-MM month column, one row per customer and month
+ALTER TABLE customers_data_mart MODIFY sales_date_month VARCHAR(10);
+UPDATE customers_data_mart SET sales_date_month = LEFT(sales_date_month, 7);
+
+CREATE TABLE customers_data_mart_merged (
+    customer_id INT ,
+    full_name VARCHAR(100),
+    address VARCHAR(200),
+    phone_number VARCHAR(20),
+    sales_date_month VARCHAR(7),
+    total_sales DECIMAL(10, 2),
+    UNIQUE KEY uk_customer_month (customer_id, sales_date_month)
+);
+
+INSERT INTO customers_data_mart_merged (customer_id, full_name, address, phone_number, sales_date_month, total_sales)
+SELECT customer_id, MAX(full_name), MAX(address), MAX(phone_number), sales_date_month, SUM(total_sales)
+FROM customers_data_mart
+GROUP BY customer_id, sales_date_month;
+
+RENAME TABLE customers_data_mart TO customers_data_mart_pre_merge,
+             customers_data_mart_merged TO customers_data_mart;
+
+
+-- sales team mart: one row per store, sales person and month, incentive ranked again
+CREATE TABLE sales_team_data_mart_merged (
+    store_id INT,
+    sales_person_id INT,
+    full_name VARCHAR(255),
+    sales_month VARCHAR(10),
+    total_sales DECIMAL(10, 2),
+    incentive DECIMAL(10, 2),
+    UNIQUE KEY uk_store_person_month (store_id, sales_person_id, sales_month)
+);
+
+INSERT INTO sales_team_data_mart_merged (store_id, sales_person_id, full_name, sales_month, total_sales, incentive)
+SELECT store_id, sales_person_id, MAX(full_name), sales_month, SUM(total_sales), 0
+FROM sales_team_data_mart
+GROUP BY store_id, sales_person_id, sales_month;
+
+UPDATE sales_team_data_mart_merged m
+JOIN (SELECT store_id, sales_person_id, sales_month,
+             RANK() OVER (PARTITION BY store_id, sales_month ORDER BY total_sales DESC) AS rnk
+      FROM sales_team_data_mart_merged) ranked
+  ON m.store_id = ranked.store_id
+ AND m.sales_person_id = ranked.sales_person_id
+ AND m.sales_month = ranked.sales_month
+SET m.incentive = CASE WHEN ranked.rnk = 1 THEN m.total_sales * 0.01 ELSE 0 END;
+
+RENAME TABLE sales_team_data_mart TO sales_team_data_mart_pre_merge,
+             sales_team_data_mart_merged TO sales_team_data_mart;
+
+
+-- staging tables for the incremental mart merge
+CREATE TABLE IF NOT EXISTS customers_data_mart_stage (
+    customer_id INT ,
+    full_name VARCHAR(100),
+    address VARCHAR(200),
+    phone_number VARCHAR(20),
+    sales_date_month VARCHAR(7),
+    total_sales DECIMAL(10, 2)
+);
+
+CREATE TABLE IF NOT EXISTS sales_team_data_mart_stage (
+    store_id INT,
+    sales_person_id INT,
+    full_name VARCHAR(255),
+    sales_month VARCHAR(10),
+    total_sales DECIMAL(10, 2)
+);
+
+
+-- batches already merged into the data marts
+CREATE TABLE IF NOT EXISTS mart_batch_log (
+    batch_id VARCHAR(64),
+    mart_table VARCHAR(100),
+    applied_at TIMESTAMP,
+    PRIMARY KEY (batch_id, mart_table)
+);
+
+-- After checking the merged tables:
+-- DROP TABLE customers_data_mart_pre_merge;
+-- DROP TABLE sales_team_data_mart_pre_merge;
@@ -153,8 +153,9 @@ CREATE TABLE customers_data_mart (
     full_name VARCHAR(100),
     address VARCHAR(200),
     phone_number VARCHAR(20),
-    sales_date_month DATE,
-    total_sales DECIMAL(10, 2)
+    sales_date_month VARCHAR(7),
+    total_sales DECIMAL(10, 2),
+    UNIQUE KEY uk_customer_month (customer_id, sales_date_month)
 );
 
 
@@ -165,5 +166,34 @@ CREATE TABLE sales_team_data_mart (
     full_name VARCHAR(255),
     sales_month VARCHAR(10),
     total_sales DECIMAL(10, 2),
-    incentive DECIMAL(10, 2)
+    incentive DECIMAL(10, 2),
+    UNIQUE KEY uk_store_person_month (store_id, sales_person_id, sales_month)
+);
+
+
+-- staging tables for the incremental mart merge
+CREATE TABLE customers_data_mart_stage (
+    customer_id INT ,
+    full_name VARCHAR(100),
+    address VARCHAR(200),
+    phone_number VARCHAR(20),
+    sales_date_month VARCHAR(7),
+    total_sales DECIMAL(10, 2)
+);
+
+CREATE TABLE sales_team_data_mart_stage (
+    store_id INT,
+    sales_person_id INT,
+    full_name VARCHAR(255),
+    sales_month VARCHAR(10),
+    total_sales DECIMAL(10, 2)
+);
+
+
+-- batches already merged into the data marts
+CREATE TABLE mart_batch_log (
+    batch_id VARCHAR(64),
+    mart_table VARCHAR(100),
+    applied_at TIMESTAMP,
+    PRIMARY KEY (batch_id, mart_table)
 );
\ No newline at end of file
@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+import threading
+import time
+from src.main.utility.logging_config import *
+from src.main.utility.my_sql_session import mysql_connection
+
+
+#Local parquet snapshots of the MySQL dimension tables.
+#A table is only fetched when get() is called for it. Within ttl_seconds the snapshot
+#is used as is; after that a cheap change detection query decides whether the
+#snapshot is still valid or the table has to be reloaded over JDBC. A snapshot
+#loaded more than max_age_seconds ago is always reloaded.
+class DimensionCache:
+    def __init__(self, spark, database_reader, cache_directory, ttl_seconds, change_detection,
+                 max_age_seconds=None):
+        self.spark = spark
+        self.database_reader = database_reader
+        self.cache_directory = cache_directory
+        self.ttl_seconds = ttl_seconds
+        self.change_detection = change_detection
+        self.max_age_seconds = max_age_seconds
+        self.loaded = {}
+        #self.lock guards loaded and table_locks, a table lock is held while that
+        #table is checked or refreshed so different tables load concurrently
+        self.lock = threading.Lock()
+        self.table_locks = {}
+
+    def _table_lock(self, table_name):
+        with self.lock:
+            return self.table_locks.setdefault(table_name, threading.Lock())
+
+    def _table_directory(self, table_name):
+        return os.path.join(self.cache_directory, table_name)
+
+    def _meta_path(self, table_name):
+        return os.path.join(self._table_directory(table_name), "_meta.json")
+
+    def _snapshot_path(self, table_name):
+        return os.path.join(self._table_directory(table_name), "snapshot")
+
+    def _read_meta(self, table_name):
+        meta_path = self._meta_path(table_name)
+        if not os.path.exists(meta_path) or not os.path.isdir(self._snapshot_path(table_name)):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def _write_meta(self, table_name, meta):
+        temp_path = self._meta_path(table_name) + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(temp_path, self._meta_path(table_name))
+
+    #Signature of the table contents according to the configured method:
+    #  count    - row count and MAX(key_column)
+    #  updated  - row count and MAX(updated_column)
+    #  checksum - CHECKSUM TABLE (reads the whole table on InnoDB, keep for small tables)
+    def signature(self, table_name):
+        detection = self.change_detection.get(table_name, {"method": "checksum"})
+        method = detection["method"]
+        with mysql_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                if method == "count":
+                    cursor.execute(f"SELECT COUNT(*), MAX({detection['key_column']}) FROM {table_name}")
+                elif method == "updated":
+                    cursor.execute(f"SELECT COUNT(*), MAX({detection['updated_column']}) FROM {table_name}")
+                elif method == "checksum":
+                    cursor.execute(f"CHECKSUM TABLE {table_name}")
+                else:
+                    raise Exception(f"Unknown change detection method {method} for {table_name}")
+                return [str(value) for value in cursor.fetchone()]
+            finally:
+                cursor.close()
+
+    def _refresh(self, table_name, columns, signature):
+        logger.info(f"Loading {table_name} from MySQL into the dimension cache")
+        df = self.database_reader.create_dataframe(self.spark, table_name, columns=columns)
+        os.makedirs(self._table_directory(table_name), exist_ok=True)
+        temp_path = self._snapshot_path(table_name) + ".tmp"
+        df.write.mode("overwrite").parquet(temp_path)
+        shutil.rmtree(self._snapshot_path(table_name), ignore_errors=True)
+        os.replace(temp_path, self._snapshot_path(table_name))
+        self._write_meta(table_name, {"signature": signature,
+                                      "columns": columns,
+                                      "refreshed_at": time.time(),
+                                      "loaded_at": time.time()})
+
+    #DataFrame of the table, served from the local snapshot whenever it is still valid
+    def get(self, table_name, columns=None):
+        with self._table_lock(table_name):
+            with self.lock:
+                if table_name in self.loaded:
+                    return self.loaded[table_name]
+            meta = self._read_meta(table_name)
+            if meta is None or meta["columns"] != columns:
+                self._refresh(table_name, columns, self.signature(table_name))
+            elif self.max_age_seconds is not None and \
+                    time.time() - meta.get("loaded_at", 0) >= self.max_age_seconds:
+                logger.info(f"The snapshot of {table_name} reached its maximum age, reloading it")
+                self._refresh(table_name, columns, self.signature(table_name))
+            elif time.time() - meta["refreshed_at"] < self.ttl_seconds:
+                logger.info(f"Using the cached snapshot of {table_name}, within its TTL")
+            else:
+                signature = self.signature(table_name)
+                if signature == meta["signature"]:
+                    logger.info(f"Using the cached snapshot of {table_name}, source unchanged")
+                    meta["refreshed_at"] = time.time()
+                    self._write_meta(table_name, meta)
+                else:
+                    logger.info(f"{table_name} changed in MySQL, refreshing the snapshot")
+                    self._refresh(table_name, columns, signature)
+            df = self.spark.read.parquet(self._snapshot_path(table_name))
+            with self.lock:
+                self.loaded[table_name] = df
+            return df
+
+    def invalidate(self, table_name):
+        with self._table_lock(table_name), self.lock:
+            self.loaded.pop(table_name, None)
+            shutil.rmtree(self._table_directory(table_name), ignore_errors=True)
+        logger.info(f"Invalidated the cached snapshot of {table_name}")
+
+    def invalidate_all(self):
+        with self.lock:
+            self.loaded = {}
+            shutil.rmtree(self.cache_directory, ignore_errors=True)
+        logger.info("Invalidated every cached dimension snapshot")
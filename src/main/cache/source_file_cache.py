@@ -0,0 +1,115 @@
+import json
+import os
+import shutil
+import threading
+import time
+import traceback
+from src.main.utility.logging_config import *
+
+INDEX_FILE_NAME = "_index.json"
+STAGING_DIRECTORY = "_staging"
+
+
+#Local Parquet copies of parsed source CSV files keyed by content (S3 ETag or md5).
+#Each entry is a directory of parquet files, least recently used entries are
+#evicted once the cache grows over max_bytes.
+class SourceFileCache:
+    def __init__(self, cache_directory, max_bytes):
+        self.cache_directory = cache_directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_directory, INDEX_FILE_NAME)
+        self.lock = threading.Lock()
+        os.makedirs(cache_directory, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except Exception as e:
+            logger.error(f"Cache index {self.index_path} is unreadable, starting empty : {str(e)}")
+            return {}
+        #Drop entries whose data was removed behind our back
+        return {key: entry for key, entry in index.items() if os.path.isdir(self.path_for(key))}
+
+    def _save_index(self):
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(temp_path, self.index_path)
+
+    def _directory_size(self, path):
+        total = 0
+        for root, dirs, files in os.walk(path):
+            for file in files:
+                total += os.path.getsize(os.path.join(root, file))
+        return total
+
+    def path_for(self, content_key):
+        return os.path.join(self.cache_directory, content_key)
+
+    def staging_path(self, name):
+        return os.path.join(self.cache_directory, STAGING_DIRECTORY, name)
+
+    def contains(self, content_key):
+        with self.lock:
+            return content_key in self.index and os.path.isdir(self.path_for(content_key))
+
+    #Mark entries as used by this run so eviction keeps them
+    def touch(self, content_keys):
+        with self.lock:
+            now = time.time()
+            for content_key in content_keys:
+                if content_key in self.index:
+                    self.index[content_key]["last_access"] = now
+            self._save_index()
+
+    #Move a freshly written parquet directory into the cache,
+    #call evict() once the whole batch has been added
+    def add(self, content_key, source_directory, source_file=None):
+        with self.lock:
+            destination = self.path_for(content_key)
+            if os.path.exists(destination):
+                shutil.rmtree(destination)
+            shutil.move(source_directory, destination)
+            self.index[content_key] = {"bytes": self._directory_size(destination),
+                                       "source_file": source_file,
+                                       "created": time.time(),
+                                       "last_access": time.time()}
+            self._save_index()
+
+    def invalidate(self, content_key):
+        with self.lock:
+            self.index.pop(content_key, None)
+            shutil.rmtree(self.path_for(content_key), ignore_errors=True)
+            self._save_index()
+        logger.info(f"Invalidated cached source file {content_key}")
+
+    def invalidate_all(self):
+        with self.lock:
+            for content_key in list(self.index):
+                shutil.rmtree(self.path_for(content_key), ignore_errors=True)
+            self.index = {}
+            self._save_index()
+        logger.info("Invalidated every cached source file")
+
+    #Evict least recently used entries until the cache fits in max_bytes.
+    #protected keys (the ones the current run reads) are never evicted.
+    def evict(self, protected=()):
+        with self.lock:
+            total = sum(entry["bytes"] for entry in self.index.values())
+            candidates = sorted((entry["last_access"], key) for key, entry in self.index.items()
+                                if key not in protected)
+            for last_access, content_key in candidates:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    shutil.rmtree(self.path_for(content_key), ignore_errors=True)
+                    total -= self.index.pop(content_key)["bytes"]
+                    logger.info(f"Evicted cached source file {content_key}")
+                except Exception as e:
+                    logger.error(f"Error evicting {content_key} : {str(e)}")
+                    print(traceback.format_exc())
+            self._save_index()
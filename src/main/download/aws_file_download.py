@@ -1,27 +1,74 @@
 import boto3
+import time
 import traceback
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from resources import config
 from src.main.utility.logging_config import *
+from src.main.utility.s3_transfer import get_transfer_config, local_file_matches
 
 class S3FileDownloader:
-    def __init__(self,s3_client, bucket_name, local_directory):
+    def __init__(self,s3_client, bucket_name, local_directory, max_workers=None):
         self.bucket_name = bucket_name
         self.local_directory = local_directory
         self.s3_client = s3_client
+        self.max_workers = max_workers or config.s3_download_max_workers
+        self.transfer_config = get_transfer_config()
 
+    #list_files accepts plain keys or the object dicts streamed by S3Reader.iter_objects.
+    #Returns one result per file with bytes, seconds and whether it was skipped.
     def download_files(self, list_files):
-        logger.info("Running download files for these files %s",list_files)
-        for key in list_files:
-            file_name = os.path.basename(key)
-            logger.info("File name to download: %s ",file_name)
-            download_file_path = os.path.join(self.local_directory, file_name)
-            try:
-                logger.info("Started downloading file %s",key)
-                self.s3_client.download_file(self.bucket_name,key,download_file_path)
-            except Exception as e:
-                error_message = f"Error downloading file '{key}': {str(e)}"
-                traceback_message = traceback.format_exc()
-                print(error_message)
-                print(traceback_message)
-                raise e
+        objects = [obj if isinstance(obj, dict) else {"key": obj} for obj in list_files]
+        #Files land flat in local_directory, two keys with one file name would overwrite each other
+        keys_by_name = {}
+        for obj in objects:
+            keys_by_name.setdefault(os.path.basename(obj["key"]), []).append(obj["key"])
+        duplicates = {name: keys for name, keys in keys_by_name.items() if len(keys) > 1}
+        if duplicates:
+            raise Exception(f"Source files share a file name across prefixes: {duplicates}")
+        logger.info("Running download for %s files with %s workers", len(objects), self.max_workers)
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._download_one, obj): obj["key"] for obj in objects}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    error_message = f"Error downloading file '{key}': {str(e)}"
+                    traceback_message = traceback.format_exc()
+                    print(error_message)
+                    print(traceback_message)
+                    for pending in futures:
+                        pending.cancel()
+                    raise e
 
+        downloaded = [r for r in results if not r["skipped"]]
+        total_bytes = sum(r["bytes"] for r in downloaded)
+        logger.info("Downloaded %s files (%s bytes), skipped %s already present locally",
+                    len(downloaded), total_bytes, len(results) - len(downloaded))
+        return results
+
+    def _download_one(self, obj):
+        key = obj["key"]
+        file_name = os.path.basename(key)
+        download_file_path = os.path.join(self.local_directory, file_name)
+        start = time.perf_counter()
+
+        if os.path.exists(download_file_path):
+            if "etag" not in obj or "size" not in obj:
+                head = self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+                obj = dict(obj, size=head["ContentLength"], etag=head["ETag"])
+            if local_file_matches(download_file_path, obj["size"], obj["etag"]):
+                logger.info("Skipping %s, local copy matches size and ETag", key)
+                return {"key": key, "local_path": download_file_path, "bytes": obj["size"],
+                        "seconds": time.perf_counter() - start, "skipped": True}
+
+        logger.info("Started downloading file %s",key)
+        self.s3_client.download_file(self.bucket_name, key, download_file_path,
+                                     Config=self.transfer_config)
+        seconds = time.perf_counter() - start
+        size = os.path.getsize(download_file_path)
+        logger.info("Downloaded %s (%s bytes) in %.2fs", key, size, seconds)
+        return {"key": key, "local_path": download_file_path, "bytes": size,
+                "seconds": seconds, "skipped": False}
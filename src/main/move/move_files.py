@@ -1,59 +1,84 @@
+import os
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from resources import config
+from src.main.read.aws_read import S3Reader
 from src.main.utility.logging_config import *
 
-
-def move_s3_to_s3(s3_client, bucket_name, source_prefix, destination_prefix):
+DELETE_BATCH_SIZE = 1000
+
+
+#Move objects from source_prefix to destination_prefix.
+#The prefix is listed once (unless keys are given), copies run on a thread
+#pool and sources are removed with batched delete_objects calls.
+#Returns one result per key: {"key", "destination_key", "status", "error"}
+def move_s3_objects(s3_client, bucket_name, source_prefix, destination_prefix, keys=None, max_workers=None):
+    max_workers = max_workers or config.s3_move_max_workers
+    if keys is None:
+        keys = [obj["key"] for obj in S3Reader().iter_objects(s3_client, bucket_name, source_prefix)]
+    keys = sorted(set(keys))
+    results = {key: {"key": key,
+                     "destination_key": destination_prefix + key[len(source_prefix):],
+                     "status": "pending",
+                     "error": None} for key in keys}
+    if not keys:
+        return []
+
+    def copy(key):
+        s3_client.copy_object(Bucket=bucket_name,
+                              CopySource={'Bucket': bucket_name, 'Key': key},
+                              Key=results[key]["destination_key"])
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(keys))) as executor:
+        futures = {executor.submit(copy, key): key for key in keys}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                future.result()
+                results[key]["status"] = "copied"
+            except Exception as e:
+                results[key]["status"] = "copy_failed"
+                results[key]["error"] = str(e)
+                logger.error(f"Error copying {key} : {str(e)}")
+
+    #Only delete sources whose copy succeeded
+    copied = [key for key in keys if results[key]["status"] == "copied"]
+    for i in range(0, len(copied), DELETE_BATCH_SIZE):
+        batch = copied[i:i + DELETE_BATCH_SIZE]
+        response = s3_client.delete_objects(Bucket=bucket_name,
+                                            Delete={'Objects': [{'Key': key} for key in batch],
+                                                    'Quiet': True})
+        failed = set()
+        for error in response.get('Errors', []):
+            failed.add(error['Key'])
+            results[error['Key']]["status"] = "delete_failed"
+            results[error['Key']]["error"] = error.get('Message')
+            logger.error(f"Error deleting {error['Key']} : {error.get('Message')}")
+        for key in batch:
+            if key not in failed:
+                results[key]["status"] = "moved"
+
+    moved = sum(1 for r in results.values() if r["status"] == "moved")
+    logger.info(f"Moved {moved} of {len(keys)} objects from {source_prefix} to {destination_prefix}")
+    return [results[key] for key in keys]
+
+
+#keys moves exactly those objects without listing the prefix. Otherwise
+#file_name (a single name or a collection of names) is matched against the
+#file names under the prefix, and a name without a matching object is a failure.
+def move_s3_to_s3(s3_client, bucket_name, source_prefix, destination_prefix,file_name=None, keys=None):
     try:
-        response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=source_prefix)
-
-        for obj in response.get('Contents', []):
-            source_key = obj['Key']
-            destination_key = destination_prefix + source_key[len(source_prefix):]
-
-            s3_client.copy_object(Bucket=bucket_name,
-                                  CopySource={'Bucket': bucket_name,
-                                              'Key': source_key}, Key=destination_key)
-
-            s3_client.delete_object(Bucket=bucket_name, Key=source_key)
-        return f"Data Moved succesfully from {source_prefix} to {destination_prefix}"
-    except Exception as e:
-        logger.error(f"Error moving file : {str(e)}")
-        traceback_message = traceback.format_exc()
-        print(traceback_message)
-        raise e
-
-
-def move_s3_to_s3(s3_client, bucket_name, source_prefix, destination_prefix,file_name=None):
-    try:
-        response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=source_prefix)
-
-        if file_name is None:
-            for obj in response.get('Contents', []):
-                source_key = obj['Key']
-                destination_key = destination_prefix + source_key[len(source_prefix):]
-
-                s3_client.copy_object(Bucket=bucket_name,
-                                      CopySource={'Bucket': bucket_name,
-                                                  'Key': source_key}, Key=destination_key)
-
-                s3_client.delete_object(Bucket=bucket_name, Key=source_key)
-            # return f"Data Moved succesfully from {source_prefix} to {destination_prefix}"
-        else:
-            for obj in response.get('Contents', []):
-                source_key = obj['Key']
-
-                if source_key.endswith(file_name):
-                    destination_key = destination_prefix + source_key[len(source_prefix):]
-
-                    s3_client.copy_object(Bucket=bucket_name,
-                                          CopySource={'Bucket': bucket_name,
-                                                      'Key': source_key}, Key=destination_key)
-
-                    s3_client.delete_object(Bucket=bucket_name, Key=source_key)
-                    logger.info(f"Moved file: {source_key} to {destination_key}")
-                # else:
-                #     logger.info(f"Skipped file: {source_key} as it doesn't match the filename criteria")
-
+        unmatched = []
+        if keys is None and file_name is not None:
+            file_names = {file_name} if isinstance(file_name, str) else set(file_name)
+            keys = [obj["key"] for obj in S3Reader().iter_objects(s3_client, bucket_name, source_prefix)
+                    if os.path.basename(obj["key"]) in file_names]
+            unmatched = sorted(file_names - {os.path.basename(key) for key in keys})
+
+        results = move_s3_objects(s3_client, bucket_name, source_prefix, destination_prefix, keys)
+        failed = [r["key"] for r in results if r["status"] != "moved"] + unmatched
+        if failed:
+            raise Exception(f"Failed to move {len(failed)} objects: {failed}")
         return f"Data Moved successfully from {source_prefix} to {destination_prefix}"
     except Exception as e:
         logger.error(f"Error moving file : {str(e)}")
@@ -1,19 +1,97 @@
 import boto3
+import queue
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from resources import config
 from src.main.utility.logging_config import *
 
 class S3Reader:
 
-    def list_files(self, s3_client, bucket_name,folder_path):
+    def __init__(self, max_workers=None, page_size=None):
+        self.max_workers = max_workers or config.s3_list_max_workers
+        self.page_size = page_size or config.s3_list_page_size
+
+    #Walk every page of list_objects_v2 for one prefix
+    def _list_prefix(self, s3_client, bucket_name, prefix, delimiter=None):
+        paginator = s3_client.get_paginator('list_objects_v2')
+        params = {'Bucket': bucket_name, 'Prefix': prefix,
+                  'PaginationConfig': {'PageSize': self.page_size}}
+        if delimiter:
+            params['Delimiter'] = delimiter
+        for page in paginator.paginate(**params):
+            for obj in page.get('Contents', []):
+                if obj['Key'].endswith('/'):
+                    continue
+                yield {"key": obj['Key'],
+                       "size": obj['Size'],
+                       "etag": obj['ETag'].strip('"'),
+                       "last_modified": obj['LastModified']}
+
+    #Sub prefixes (date or store shards) one level below folder_path
+    def list_shards(self, s3_client, bucket_name, folder_path):
+        shards = []
+        paginator = s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=folder_path, Delimiter='/'):
+            shards.extend(p['Prefix'] for p in page.get('CommonPrefixes', []))
+        return shards
+
+    #Stream objects under folder_path as dicts with key, size, etag and last_modified.
+    #With fan_out the shards below folder_path (or the given shard_prefixes) are
+    #listed in parallel threads and keys are yielded as soon as any page comes back.
+    def iter_objects(self, s3_client, bucket_name, folder_path, shard_prefixes=None, fan_out=False):
         try:
-            response = s3_client.list_objects_v2(Bucket=bucket_name,Prefix=folder_path)
-            if 'Contents' in response:
-                logger.info("Total files available in folder '%s' of bucket '%s': %s", folder_path, bucket_name, response)
-                files = [f"s3://{bucket_name}/{obj['Key']}" for obj in response['Contents'] if
-                         not obj['Key'].endswith('/')]
-                return files
-            else:
-                return []
+            if shard_prefixes is None and not fan_out:
+                yield from self._list_prefix(s3_client, bucket_name, folder_path)
+                return
+
+            if shard_prefixes is None:
+                shard_prefixes = self.list_shards(s3_client, bucket_name, folder_path)
+                #Objects sitting directly in folder_path are not part of any shard
+                yield from self._list_prefix(s3_client, bucket_name, folder_path, delimiter='/')
+            if not shard_prefixes:
+                return
+
+            results = queue.Queue(maxsize=self.page_size * 4)
+            stop = threading.Event()
+            done = object()
+
+            #Workers give up once the consumer stops iterating, so a closed
+            #generator never leaves a thread blocked on a full queue
+            def put(item):
+                while not stop.is_set():
+                    try:
+                        results.put(item, timeout=0.5)
+                        return True
+                    except queue.Full:
+                        continue
+                return False
+
+            def worker(prefix):
+                try:
+                    for obj in self._list_prefix(s3_client, bucket_name, prefix):
+                        if not put(obj):
+                            return
+                except Exception as e:
+                    put(e)
+                finally:
+                    put(done)
+
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(shard_prefixes))) as executor:
+                for prefix in shard_prefixes:
+                    executor.submit(worker, prefix)
+                remaining = len(shard_prefixes)
+                try:
+                    while remaining:
+                        item = results.get()
+                        if item is done:
+                            remaining -= 1
+                        elif isinstance(item, Exception):
+                            raise item
+                        else:
+                            yield item
+                finally:
+                    stop.set()
         except Exception as e:
             error_message = f"Error listing files: {e}"
             traceback_message = traceback.format_exc()
@@ -21,6 +99,16 @@ class S3Reader:
             print(traceback_message)
             raise
 
+    #Path Spark executors can read directly, e.g. s3a://bucket/sales_data/file.csv
+    def to_spark_path(self, bucket_name, key, scheme="s3a"):
+        return f"{scheme}://{bucket_name}/{key}"
+
+    def list_files(self, s3_client, bucket_name,folder_path, fan_out=False):
+        files = [f"s3://{bucket_name}/{obj['key']}"
+                 for obj in self.iter_objects(s3_client, bucket_name, folder_path, fan_out=fan_out)]
+        logger.info("Total files available in folder '%s' of bucket '%s': %s", folder_path, bucket_name, len(files))
+        return files
+
 
 ################### Directory will also be available if you use this ###########
 
@@ -0,0 +1,80 @@
+import csv
+import io
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from resources import config
+from src.main.utility.logging_config import *
+
+HEADER_RANGE_BYTES = 64 * 1024
+
+
+#Validate source CSV files by their header line only, no Spark job involved.
+#Local files are read up to the first newline, s3:// and s3a:// paths with a ranged GET.
+class CsvHeaderValidator:
+    def __init__(self, mandatory_columns, s3_client=None, max_workers=None):
+        self.mandatory_columns = mandatory_columns
+        self.s3_client = s3_client
+        self.max_workers = max_workers or config.schema_check_max_workers
+
+    def _parse_header(self, first_line):
+        first_line = first_line.lstrip("\ufeff")
+        return [column.strip() for column in next(csv.reader(io.StringIO(first_line)), [])]
+
+    def read_header(self, file_path):
+        if "://" in file_path:
+            bucket_name, key = file_path.split("://", 1)[1].split("/", 1)
+            try:
+                response = self.s3_client.get_object(Bucket=bucket_name, Key=key,
+                                                     Range=f"bytes=0-{HEADER_RANGE_BYTES - 1}")
+            except ClientError as e:
+                #A range on an empty object is unsatisfiable, the file has no header
+                if e.response.get("Error", {}).get("Code") == "InvalidRange":
+                    return []
+                raise
+            first_line = response["Body"].read().decode("utf-8", errors="replace").splitlines()[0:1]
+            return self._parse_header(first_line[0] if first_line else "")
+        with open(file_path, "r", encoding="utf-8", errors="replace", newline="") as f:
+            return self._parse_header(f.readline())
+
+    #Returns a dict with
+    #  correct - exactly the mandatory columns
+    #  extra   - all mandatory columns plus some more
+    #  missing - at least one mandatory column absent from a header that was read
+    #  headers - the header list of every file
+    def validate(self, files):
+        result = {"correct": [], "extra": [], "missing": [], "headers": {}}
+        if not files:
+            return result
+
+        #A header that cannot be read (e.g. S3 throttling or a timeout) is retried and
+        #then raised, the file must not be moved to the error folder for it
+        def check(file_path):
+            for attempt in range(1, config.schema_check_read_attempts + 1):
+                try:
+                    return file_path, self.read_header(file_path)
+                except Exception as e:
+                    if attempt == config.schema_check_read_attempts:
+                        logger.error("Could not read the header of %s : %s", file_path, e)
+                        print(traceback.format_exc())
+                        raise e
+                    logger.info("Retrying the header of %s after attempt %s failed : %s", file_path, attempt, e)
+                    time.sleep(2 ** (attempt - 1))
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(files))) as executor:
+            headers = list(executor.map(check, files))
+
+        mandatory = set(self.mandatory_columns)
+        for file_path, header in headers:
+            result["headers"][file_path] = header
+            missing_columns = mandatory - set(header)
+            if missing_columns:
+                logger.info(f"Missing columns in the file {file_path} are: {missing_columns}")
+                result["missing"].append(file_path)
+            elif set(header) - mandatory:
+                logger.info(f"Extra columns in the file {file_path} are: {set(header) - mandatory}")
+                result["extra"].append(file_path)
+            else:
+                result["correct"].append(file_path)
+        return result
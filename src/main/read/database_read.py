@@ -1,10 +1,63 @@
+import math
+from resources import config
+from src.main.utility.logging_config import *
+
 class DatabaseReader:
     def __init__(self,url,properties):
         self.url = url
         self.properties = properties
+        #Row count of every table whose bounds were read, JDBC relations have no statistics
+        self.row_counts = {}
+
+    #Table or sub query that only selects the needed columns and rows
+    def _source(self, table_name, columns=None, predicate=None):
+        if not columns and not predicate:
+            return table_name
+        select_list = ", ".join(columns) if columns else "*"
+        where = f" WHERE {predicate}" if predicate else ""
+        return f"(SELECT {select_list} FROM {table_name}{where}) AS {table_name}_src"
+
+    #MIN/MAX/COUNT of the partition column, read through the same JDBC connection settings
+    def _bounds(self, spark, table_name, partition_column, predicate=None):
+        where = f" WHERE {predicate}" if predicate else ""
+        bounds_query = f"(SELECT MIN({partition_column}) AS lower_bound, MAX({partition_column}) AS upper_bound, " \
+                       f"COUNT(*) AS row_count FROM {table_name}{where}) AS {table_name}_bounds"
+        row = spark.read.jdbc(url=self.url, table=bounds_query, properties=self.properties).collect()[0]
+        return row["lower_bound"], row["upper_bound"], row["row_count"]
+
+    #columns / predicate push the projection and filter down to MySQL.
+    #partition_column defaults to config.jdbc_partition_columns[table_name]; when set,
+    #the table is split into up to num_partitions ranges read over parallel connections.
+    def create_dataframe(self,spark,table_name, columns=None, predicate=None,
+                         partition_column=None, num_partitions=None, fetch_size=None):
+        partition_column = partition_column or config.jdbc_partition_columns.get(table_name)
+        num_partitions = num_partitions or config.jdbc_num_partitions
+        fetch_size = fetch_size or config.jdbc_fetch_size
+        if columns and partition_column and partition_column not in columns:
+            columns = list(columns) + [partition_column]
+
+        properties = dict(self.properties, fetchsize=str(fetch_size))
+        source = self._source(table_name, columns, predicate)
+
+        if partition_column and num_partitions > 1:
+            lower_bound, upper_bound, row_count = self._bounds(spark, table_name, partition_column, predicate)
+            self.row_counts[table_name] = row_count
+            #Small tables are not worth more than one connection
+            num_partitions = max(1, min(num_partitions,
+                                        math.ceil(row_count / config.jdbc_min_rows_per_partition)))
+            if lower_bound is not None and num_partitions > 1 and upper_bound > lower_bound:
+                logger.info(f"Reading {table_name} ({row_count} rows) in {num_partitions} partitions on "
+                            f"{partition_column} between {lower_bound} and {upper_bound}")
+                return spark.read.jdbc(url=self.url,
+                                       table=source,
+                                       column=partition_column,
+                                       lowerBound=int(lower_bound),
+                                       upperBound=int(upper_bound),
+                                       numPartitions=num_partitions,
+                                       properties=properties)
 
-    def create_dataframe(self,spark,table_name):
+        logger.info(f"Reading {table_name} in a single partition")
         df = spark.read.jdbc(url=self.url,
-                             table=table_name,
-                             properties=self.properties)
-        return df
\ No newline at end of file
+                             table=source,
+                             properties=properties)
+        return df
@@ -0,0 +1,134 @@
+import os
+import shutil
+import uuid
+from functools import reduce
+from urllib.parse import quote
+from pyspark.sql.functions import *
+from pyspark.sql.types import *
+from src.main.utility.logging_config import *
+
+# Schema of the sales data handed to the dimension joins
+sales_data_schema = StructType([
+    StructField("customer_id", IntegerType(), True),
+    StructField("store_id", IntegerType(), True),
+    StructField("product_name", StringType(), True),
+    StructField("sales_date", DateType(), True),
+    StructField("sales_person_id", IntegerType(), True),
+    StructField("price", FloatType(), True),
+    StructField("quantity", IntegerType(), True),
+    StructField("total_cost", FloatType(), True),
+    StructField("additional_column", StringType(), True)
+])
+
+sales_data_columns = [field.name for field in sales_data_schema.fields]
+
+
+#Group files that share the exact same header so each group is one Spark read
+def group_files_by_header(file_headers):
+    groups = {}
+    for file_path, header in file_headers.items():
+        groups.setdefault(tuple(header), []).append(file_path)
+    return groups
+
+
+#Explicit read schema for one header: known columns keep their type,
+#extra columns coming from source are read as strings
+def schema_for_header(header):
+    known_types = {field.name: field.dataType for field in sales_data_schema.fields}
+    return StructType([StructField(column, known_types.get(column, StringType()), True)
+                       for column in header])
+
+
+#Fold every column that is not mandatory into additional_column
+#and return the columns in the order of sales_data_schema
+def fold_extra_columns(df, header, mandatory_columns):
+    extra_columns = [column for column in header if column not in mandatory_columns]
+    if extra_columns:
+        df = df.withColumn("additional_column", concat_ws(", ", *extra_columns))
+    else:
+        df = df.withColumn("additional_column", lit(None).cast(StringType()))
+    return df.select(*sales_data_columns)
+
+
+def _read_csv_groups(spark, file_headers, mandatory_columns):
+    group_dfs = []
+    for header, files in group_files_by_header(file_headers).items():
+        logger.info(f"Reading {len(files)} files with columns {list(header)}")
+        group_df = spark.read.format("csv")\
+            .option("header", "true")\
+            .schema(schema_for_header(header))\
+            .load(files)
+        group_dfs.append(fold_extra_columns(group_df, header, mandatory_columns))
+    return group_dfs
+
+
+#Parse the uncached files once and write them into the cache as parquet.
+#All files go through a single write partitioned by their content key,
+#every partition directory then becomes one cache entry.
+def _populate_cache(spark, cache, file_headers, content_keys, mandatory_columns):
+    group_dfs = _read_csv_groups(spark, file_headers, mandatory_columns)
+    if not group_dfs:
+        return
+    key_by_name = {}
+    for file_path in file_headers:
+        file_name = os.path.basename(file_path)
+        key_by_name[file_name] = content_keys[file_path]
+        key_by_name[quote(file_name)] = content_keys[file_path]
+    key_map = create_map(*[lit(item) for pair in key_by_name.items() for item in pair])
+
+    staging_path = cache.staging_path(uuid.uuid4().hex)
+    parsed_df = reduce(lambda left, right: left.unionByName(right), group_dfs)
+    parsed_df.withColumn("_cache_key", key_map[regexp_extract(input_file_name(), "([^/]+)$", 1)])\
+        .write.mode("overwrite")\
+        .partitionBy("_cache_key")\
+        .parquet(staging_path)
+
+    source_by_key = {content_keys[file_path]: file_path for file_path in file_headers}
+    for content_key, file_path in source_by_key.items():
+        partition_path = os.path.join(staging_path, f"_cache_key={content_key}")
+        if os.path.isdir(partition_path):
+            cache.add(content_key, partition_path, source_file=os.path.basename(file_path))
+        else:
+            logger.info(f"File {file_path} has no rows, nothing to cache")
+    shutil.rmtree(staging_path, ignore_errors=True)
+
+
+#Make sure every file has a parsed parquet copy in the cache and return the
+#cache paths of the batch. Files already parsed in an earlier run (same content
+#key) are reused and only new files are parsed from CSV.
+def cache_sales_data(spark, file_headers, mandatory_columns, cache, content_keys):
+    wanted_keys = {content_keys[file_path] for file_path in file_headers}
+    cache.touch(wanted_keys)
+    uncached = {}
+    seen_keys = set()
+    for file_path, header in file_headers.items():
+        content_key = content_keys[file_path]
+        if cache.contains(content_key) or content_key in seen_keys:
+            continue
+        seen_keys.add(content_key)
+        uncached[file_path] = header
+    logger.info(f"{len(file_headers) - len(uncached)} files served from the parsed file cache, "
+                f"{len(uncached)} files parsed from CSV")
+    if uncached:
+        _populate_cache(spark, cache, uncached, content_keys, mandatory_columns)
+    cache.evict(protected=wanted_keys)
+    return [cache.path_for(content_key) for content_key in sorted(wanted_keys) if cache.contains(content_key)]
+
+
+def read_cached_sales_data(spark, cached_paths):
+    if not cached_paths:
+        return spark.createDataFrame([], sales_data_schema)
+    return spark.read.schema(sales_data_schema).parquet(*cached_paths)
+
+
+#Read all correct files with one load([...]) per header signature and
+#an explicit schema, so there is no inferSchema pass and the plan stays flat.
+#With a cache the files are read from their parsed parquet copies.
+def read_sales_data(spark, file_headers, mandatory_columns, cache=None, content_keys=None):
+    if cache is None:
+        group_dfs = _read_csv_groups(spark, file_headers, mandatory_columns)
+        if not group_dfs:
+            return spark.createDataFrame([], sales_data_schema)
+        return reduce(lambda left, right: left.unionByName(right), group_dfs)
+    return read_cached_sales_data(spark, cache_sales_data(spark, file_headers, mandatory_columns,
+                                                          cache, content_keys))
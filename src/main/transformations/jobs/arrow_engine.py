@@ -0,0 +1,236 @@
+import os
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from src.main.transformations.jobs.dimension_tables_join import customer_columns, store_columns, \
+    sales_team_columns, fact_columns, enriched_columns
+from src.main.utility.logging_config import *
+from src.main.utility.my_sql_session import mysql_connection
+
+#Arrow types matching sales_data_schema in src/main/read/sales_data_read.py
+sales_data_types = {
+    "customer_id": pa.int32(),
+    "store_id": pa.int32(),
+    "product_name": pa.string(),
+    "sales_date": pa.date32(),
+    "sales_person_id": pa.int32(),
+    "price": pa.float32(),
+    "quantity": pa.int32(),
+    "total_cost": pa.float32(),
+    "additional_column": pa.string()
+}
+
+MYSQL_INSERT_BATCH_SIZE = 5000
+
+#Values Spark's PERMISSIVE CSV read accepts for each type, anything else becomes null.
+#Integers follow Integer.parseInt, floats Float.parseFloat (plus the NaN/Inf options),
+#dates the yyyy[-m[-d]] forms of the default date parsing.
+INTEGER_PATTERN = r"^[+-]?\d+$"
+FLOAT_PATTERN = r"^\s*[+-]?(?:(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?[fFdD]?|NaN|Infinity)\s*$|^-?Inf$"
+DATE_PATTERN = r"^\s*(?P<year>\d{4})(?:-(?P<month>\d{1,2})(?:-(?P<day>\d{1,2})(?:[ T].*)?)?)?\s*$"
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+#Single machine engine for small batches. It runs the same steps as the Spark
+#path (ingest, extra column folding, the three dimension joins and both marts)
+#on Arrow tables, so no JVM or SparkSession is started.
+class ArrowEngine:
+    def __init__(self, filesystem=None):
+        #filesystem is a pyarrow S3FileSystem when the files are read straight from S3
+        self.filesystem = filesystem
+
+    def _open(self, file_path):
+        if "://" in file_path:
+            return self.filesystem.open_input_stream(file_path.split("://", 1)[1])
+        return open(file_path, "rb")
+
+    #Values matching pattern, null for the others
+    def _valid(self, values, pattern):
+        return pc.if_else(pc.match_substring_regex(values, pattern), values, pa.scalar(None, pa.string()))
+
+    def _parse_integers(self, values):
+        values = self._valid(values, INTEGER_PATTERN)
+        #Drop the sign and leading zeros, more than 10 digits is out of range anyway
+        digits = pc.replace_substring_regex(values, r"^[+-]?0*(\d)", r"\1")
+        digits = pc.if_else(pc.less_equal(pc.utf8_length(digits), 10), digits, pa.scalar(None, pa.string()))
+        numbers = pc.cast(digits, pa.int64())
+        numbers = pc.if_else(pc.starts_with(values, "-"), pc.negate(numbers), numbers)
+        in_range = pc.and_(pc.greater_equal(numbers, INT32_MIN), pc.less_equal(numbers, INT32_MAX))
+        return pc.cast(pc.if_else(in_range, numbers, pa.scalar(None, pa.int64())), pa.int32())
+
+    def _parse_floats(self, values):
+        values = pc.utf8_trim_whitespace(self._valid(values, FLOAT_PATTERN))
+        values = pc.replace_substring_regex(values, r"^\+", "")
+        values = pc.replace_substring_regex(values, r"[fFdD]$", "")
+        values = pc.replace_substring_regex(values, r"Inf(inity)?$", "inf")
+        values = pc.replace_substring_regex(values, r"^NaN$", "nan")
+        #Out of range values overflow to infinity, as Float.parseFloat does
+        return pc.cast(pc.cast(values, pa.float64()), pa.float32(), safe=False)
+
+    def _parse_dates(self, values):
+        parts = pc.extract_regex(values, DATE_PATTERN)
+        month = pc.struct_field(parts, "month")
+        day = pc.struct_field(parts, "day")
+        month = pc.utf8_lpad(pc.if_else(pc.equal(month, ""), "1", month), 2, "0")
+        day = pc.utf8_lpad(pc.if_else(pc.equal(day, ""), "1", day), 2, "0")
+        text = pc.binary_join_element_wise(pc.struct_field(parts, "year"), month, day, "-")
+        #Impossible dates (e.g. 2024-02-30) are null as well
+        return pc.cast(pc.strptime(text, format="%Y-%m-%d", unit="s", error_is_null=True), pa.date32())
+
+    #Typed column the way Spark's PERMISSIVE mode reads it: a value that does
+    #not parse becomes null instead of failing the batch
+    def _parse_column(self, values, data_type):
+        if pa.types.is_int32(data_type):
+            return self._parse_integers(values)
+        if pa.types.is_float32(data_type):
+            return self._parse_floats(values)
+        if pa.types.is_date32(data_type):
+            return self._parse_dates(values)
+        return values
+
+    #Same result as read_sales_data: typed mandatory columns plus additional_column.
+    #Every column is read as a string (empty values are null, as in Spark) and then
+    #parsed, so malformed values end up null on both engines.
+    def read_sales_data(self, file_headers, mandatory_columns):
+        tables = []
+        for file_path, header in file_headers.items():
+            convert_options = pv.ConvertOptions(column_types={column: pa.string() for column in header},
+                                                strings_can_be_null=True)
+            with self._open(file_path) as f:
+                table = pv.read_csv(f, convert_options=convert_options)
+            table = pa.table([self._parse_column(table[column], sales_data_types.get(column, pa.string()))
+                              for column in header], names=list(header))
+            tables.append(self.fold_extra_columns(table, header, mandatory_columns))
+        if not tables:
+            return pa.table({name: pa.array([], type=data_type) for name, data_type in sales_data_types.items()})
+        return pa.concat_tables(tables)
+
+    #concat_ws(", ", *extra_columns) skips nulls, so does null_handling="skip"
+    def fold_extra_columns(self, table, header, mandatory_columns):
+        extra_columns = [column for column in header if column not in mandatory_columns]
+        if extra_columns:
+            additional = pc.binary_join_element_wise(*[pc.cast(table[column], pa.string())
+                                                       for column in extra_columns],
+                                                     ", ", null_handling="skip")
+        else:
+            additional = pa.nulls(table.num_rows, type=pa.string())
+        columns = [column for column in sales_data_types if column != "additional_column"]
+        return pa.table([table[column] for column in columns] + [additional],
+                        names=columns + ["additional_column"])
+
+    def load_dimension(self, table_name, columns):
+        with mysql_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(f"SELECT {', '.join(columns)} FROM {table_name}")
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        logger.info(f"Loaded {len(rows)} rows of {table_name} without Spark")
+        return pa.table({column: [row[i] for row in rows] for i, column in enumerate(columns)})
+
+    def _rename(self, table, columns, renames):
+        table = table.select(columns)
+        return table.rename_columns([renames.get(column, column) for column in columns])
+
+    #Same columns and inner join semantics as dimesions_table_join
+    def dimensions_join(self, sales_table, customer_table, store_table, sales_team_table):
+        sales = sales_table.select(fact_columns)
+        customer = customer_table.select(customer_columns)
+        store = self._rename(store_table, store_columns, {"id": "store_id"})
+        sales_team = self._rename(sales_team_table, sales_team_columns,
+                                  {"id": "sales_person_id",
+                                   "first_name": "sales_person_first_name",
+                                   "last_name": "sales_person_last_name",
+                                   "address": "sales_person_address",
+                                   "pincode": "sales_person_pincode"})
+        #Join keys must share the fact column types
+        customer = customer.set_column(0, "customer_id", pc.cast(customer["customer_id"], pa.int32()))
+        store = store.set_column(0, "store_id", pc.cast(store["store_id"], pa.int32()))
+        sales_team = sales_team.set_column(0, "sales_person_id", pc.cast(sales_team["sales_person_id"], pa.int32()))
+
+        enriched = sales.join(customer, "customer_id", join_type="inner")\
+            .join(store, "store_id", join_type="inner")\
+            .join(sales_team, "sales_person_id", join_type="inner")
+        return enriched.select(enriched_columns)
+
+    def _month(self, dates):
+        #SUBSTRING(sales_date, 1, 7) of the yyyy-MM-dd string
+        return pc.utf8_slice_codeunits(pc.cast(dates, pa.string()), 0, 7)
+
+    def customer_detail(self, enriched):
+        return enriched.select(["customer_id", "first_name", "last_name", "address", "pincode",
+                                "phone_number", "sales_date", "total_cost"])
+
+    def sales_detail(self, enriched):
+        detail = enriched.select(["store_id", "sales_person_id", "sales_person_first_name",
+                                  "sales_person_last_name", "store_manager_name", "manager_id",
+                                  "is_manager", "sales_person_address", "sales_person_pincode",
+                                  "sales_date", "total_cost"])
+        return detail.append_column("sales_month", self._month(detail["sales_date"]))
+
+    def _full_name(self, first_name, last_name):
+        #concat(first_name, " ", last_name) is null when either side is null
+        return pc.binary_join_element_wise(first_name, last_name, " ", null_handling="emit_null")
+
+    #Total sales of every customer per month, same columns as the Spark customer mart
+    def customer_mart(self, customer_detail):
+        table = pa.table({"customer_id": customer_detail["customer_id"],
+                          "full_name": self._full_name(customer_detail["first_name"], customer_detail["last_name"]),
+                          "address": customer_detail["address"],
+                          "phone_number": customer_detail["phone_number"],
+                          "sales_date_month": self._month(customer_detail["sales_date"]),
+                          "total_cost": pc.cast(customer_detail["total_cost"], pa.float64())})
+        mart = table.group_by(["customer_id", "full_name", "address", "phone_number", "sales_date_month"])\
+            .aggregate([("total_cost", "sum")])
+        return mart.rename_columns([name if name != "total_cost_sum" else "total_sales" for name in mart.column_names])\
+            .select(["customer_id", "full_name", "address", "phone_number", "sales_date_month", "total_sales"])
+
+    #Total sales of every sales person per month, the incentive is ranked in MySQL (MartUpserter)
+    def sales_mart_totals(self, sales_detail):
+        table = pa.table({"store_id": sales_detail["store_id"],
+                          "sales_person_id": sales_detail["sales_person_id"],
+                          "full_name": self._full_name(sales_detail["sales_person_first_name"],
+                                                       sales_detail["sales_person_last_name"]),
+                          "sales_month": sales_detail["sales_month"],
+                          "total_cost": pc.cast(sales_detail["total_cost"], pa.float64())})
+        totals = table.group_by(["store_id", "sales_person_id", "full_name", "sales_month"])\
+            .aggregate([("total_cost", "sum")])
+        return totals.rename_columns([name if name != "total_cost_sum" else "total_sales"
+                                      for name in totals.column_names])\
+            .select(["store_id", "sales_person_id", "full_name", "sales_month", "total_sales"])
+
+    def write_parquet(self, table, path):
+        os.makedirs(path, exist_ok=True)
+        for file in os.listdir(path):
+            if file.endswith(".parquet"):
+                os.remove(os.path.join(path, file))
+        pq.write_table(table, os.path.join(path, "part-00000.parquet"))
+
+    def write_partitioned(self, table, path, partition_columns):
+        ds.write_dataset(table, path, format="parquet",
+                         partitioning=ds.partitioning(table.select(partition_columns).schema, flavor="hive"),
+                         existing_data_behavior="delete_matching")
+
+    def read_parquet(self, path):
+        return pq.read_table(path)
+
+    def write_mysql(self, table, table_name):
+        columns = table.column_names
+        statement = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        rows = list(zip(*[table[column].to_pylist() for column in columns]))
+        with mysql_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                for i in range(0, len(rows), MYSQL_INSERT_BATCH_SIZE):
+                    cursor.executemany(statement, rows[i:i + MYSQL_INSERT_BATCH_SIZE])
+                connection.commit()
+            except Exception as e:
+                connection.rollback()
+                logger.error(f"Error writing into {table_name} : {str(e)}")
+                raise e
+            finally:
+                cursor.close()
+        logger.info(f"Data successfully written into {table_name} table ")
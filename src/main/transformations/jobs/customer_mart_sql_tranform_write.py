@@ -1,24 +1,19 @@
-from pyspark.sql.functions import *
-from pyspark.sql.window import Window
-from resources.dev import config
+from resources import config
+from src.main.transformations.jobs.sales_rollup import customer_mart_from_rollup
+from src.main.utility.diagnostics import preview
 from src.main.write.database_write import DatabaseWriter
+from src.main.write.mart_upsert import MartUpserter
 
 #calculation for customer mart
-#find out the customer total purchase every month
+#find out the customer total purchase every month from the shared sales rollup
 #write the data into MySQL table
-def customer_mart_calculation_table_write(final_customer_data_mart_df):
-    window = Window.partitionBy("customer_id","sales_date_month")
-    final_customer_data_mart = final_customer_data_mart_df.withColumn("sales_date_month",
-                                           substring(col("sales_date"),1,7))\
-                    .withColumn("total_sales_every_month_by_each_customer",
-                                sum("total_cost").over(window))\
-                    .select("customer_id", concat(col("first_name"),lit(" "),col("last_name"))
-                            .alias("full_name"),"address","phone_number",
-                            "sales_date_month",
-                            col("total_sales_every_month_by_each_customer").alias("total_sales"))\
-                    .distinct()
-    final_customer_data_mart.show()
+#The sums of this batch are merged into the existing monthly totals,
+#batch_id keeps the merge from being applied twice
+def customer_mart_calculation_table_write(sales_rollup_df, batch_id):
+    final_customer_data_mart = customer_mart_from_rollup(sales_rollup_df)
+    preview(final_customer_data_mart, "customer data mart")
     #Write the Data into MySQL customers_data_mart table
     db_writer = DatabaseWriter(url=config.url,properties=config.properties)
-    db_writer.write_dataframe(final_customer_data_mart,config.customer_data_mart_table)
-
+    MartUpserter(config.database_name).upsert_customer_mart(
+        config.customer_data_mart_table, config.customer_data_mart_stage_table, batch_id,
+        lambda stage_table: db_writer.write_dataframe(final_customer_data_mart, stage_table))
@@ -1,56 +1,78 @@
 from pyspark.sql.functions import *
+from resources import config
+from src.main.utility.dataframe_size import estimate_size_in_bytes
 from src.main.utility.logging_config import *
+
+#Columns of every dimension that the data marts need, nothing else is joined
+customer_columns = ["customer_id", "first_name", "last_name", "address", "pincode", "phone_number"]
+store_columns = ["id", "store_manager_name"]
+sales_team_columns = ["id", "first_name", "last_name", "manager_id", "is_manager", "address", "pincode"]
+fact_columns = ["customer_id", "store_id", "sales_person_id", "sales_date", "total_cost"]
+
+enriched_columns = ["customer_id", "first_name", "last_name", "address", "pincode", "phone_number",
+                    "store_id", "store_manager_name",
+                    "sales_person_id", "sales_person_first_name", "sales_person_last_name",
+                    "manager_id", "is_manager", "sales_person_address", "sales_person_pincode",
+                    "sales_date", "total_cost"]
+
+
+#Broadcast the dimension when it is known to be below the threshold,
+#otherwise leave it to a shuffle join. row_count is used when Spark has no statistics.
+def plan_dimension(dimension_name, dimension_df, threshold_bytes, row_count=None):
+    size = estimate_size_in_bytes(dimension_df, row_count)
+    if size is not None and size <= threshold_bytes:
+        logger.info(f"Join strategy for {dimension_name}: broadcast (estimated {size} bytes)")
+        return broadcast(dimension_df)
+    logger.info(f"Join strategy for {dimension_name}: shuffle (estimated "
+                f"{'unknown' if size is None else size} bytes, threshold {threshold_bytes})")
+    return dimension_df
+
+
 #enriching the data from different table
+#Every side is pruned to the columns the marts need before joining and the
+#dimension keys are renamed to the fact column names, so the result has
+#unique column names (enriched_columns). row_counts maps dimension table names to
+#their row counts (DatabaseReader.row_counts) for sides read without statistics.
 def dimesions_table_join(final_df_to_process,
-                         customer_table_df,store_table_df,sales_team_table_df):
+                         customer_table_df,store_table_df,sales_team_table_df,
+                         broadcast_threshold_bytes=None, row_counts=None):
+    if broadcast_threshold_bytes is None:
+        broadcast_threshold_bytes = config.broadcast_join_threshold_bytes
+    row_counts = row_counts or {}
 
-    #step 1 where i am adding customer table
-    # final_df_to_process.alias("s3_data") \
-    #     .join(customer_table_df.alias("ct"),
-    #           col("s3_data.customer_id") == col("ct.customer_id"),"inner") \
-    #     .show()
+    sales_df = final_df_to_process.select(*fact_columns)
 
-    #But i do not need all the columns so dropping it
-    #save the result into s3_customer_df_join
-    logger.info("Joining the final_df_to_process with customer_table_df ")
-    s3_customer_df_join = final_df_to_process.alias("s3_data") \
-        .join(customer_table_df.alias("ct"),
-              col("s3_data.customer_id") == col("ct.customer_id"),"inner") \
-        .drop("product_name","price","quantity","additional_column",
-              "s3_data.customer_id","customer_joining_date")
+    customer_df = plan_dimension("customer",
+                                 customer_table_df.select(*customer_columns),
+                                 broadcast_threshold_bytes,
+                                 row_counts.get(config.customer_table_name))
 
-    s3_customer_df_join.printSchema()
+    store_df = plan_dimension("store",
+                              store_table_df.select(col("id").alias("store_id"), "store_manager_name"),
+                              broadcast_threshold_bytes,
+                              row_counts.get(config.store_table))
 
-    #step 2 where i am adding store table details
-    # s3_customer_df_join.join(store_table_df,
-    #                          store_table_df["id"]==s3_customer_df_join["store_id"],
-    #                          "inner").show()
+    sales_team_df = plan_dimension("sales_team",
+                                   sales_team_table_df.select(col("id").alias("sales_person_id"),
+                                                              col("first_name").alias("sales_person_first_name"),
+                                                              col("last_name").alias("sales_person_last_name"),
+                                                              "manager_id",
+                                                              "is_manager",
+                                                              col("address").alias("sales_person_address"),
+                                                              col("pincode").alias("sales_person_pincode")),
+                                   broadcast_threshold_bytes,
+                                   row_counts.get(config.sales_team_table))
+
+    #step 1 where i am adding customer table
+    logger.info("Joining the final_df_to_process with customer_table_df ")
+    s3_customer_df_join = sales_df.join(customer_df, "customer_id", "inner")
 
-    #But i do not need all the columns so dropping it
-    #save the result into s3_customer_store_df_join
+    #step 2 where i am adding store table details
     logger.info("Joining the s3_customer_df_join with store_table_df ")
-    s3_customer_store_df_join= s3_customer_df_join.join(store_table_df,
-                             store_table_df["id"]==s3_customer_df_join["store_id"],
-                             "inner")\
-                        .drop("id","store_pincode","store_opening_date","reviews")
+    s3_customer_store_df_join = s3_customer_df_join.join(store_df, "store_id", "inner")
 
     #step 3 where i am adding sales team table details
-    # s3_customer_store_df_join.join(sales_team_table_df,
-    #                          sales_team_table_df["id"]==s3_customer_store_df_join["sales_person_id"],
-    #                          "inner").show()
-
-
-    #But i do not need all the columns so dropping it
-    #save the result into s3_customer_store_sales_df_join
     logger.info("Joining the s3_customer_store_df_join with sales_team_table_df ")
-    s3_customer_store_sales_df_join = s3_customer_store_df_join.join(sales_team_table_df.alias("st"),
-                             col("st.id")==s3_customer_store_df_join["sales_person_id"],
-                             "inner")\
-                .withColumn("sales_person_first_name",col("st.first_name"))\
-                .withColumn("sales_person_last_name",col("st.last_name"))\
-                .withColumn("sales_person_address",col("st.address"))\
-                .withColumn("sales_person_pincode",col("st.pincode"))\
-                .drop("id","st.first_name","st.last_name","st.address","st.pincode")
-
-    return s3_customer_store_sales_df_join
+    s3_customer_store_sales_df_join = s3_customer_store_df_join.join(sales_team_df, "sales_person_id", "inner")
 
+    return s3_customer_store_sales_df_join.select(*enriched_columns)
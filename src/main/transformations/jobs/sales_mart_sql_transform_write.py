@@ -1,30 +1,20 @@
-from pyspark.sql.functions import *
-from pyspark.sql.window import Window
-from resources.dev import config
+from resources import config
+from src.main.transformations.jobs.sales_rollup import sales_team_totals_from_rollup
+from src.main.utility.diagnostics import preview
 from src.main.write.database_write import DatabaseWriter
+from src.main.write.mart_upsert import MartUpserter
 
 #calculation for sales mart
-#find out the sales total sales every month
+#find out the sales total sales every month from the shared sales rollup
 #write the data into MySQL table
+#The batch sums are merged into the existing monthly totals and MySQL ranks
+#the incentive again for the (store, month) groups of the batch
 
-def sales_mart_calculation_table_write(final_sales_team_data_mart_df):
-    window = Window.partitionBy("store_id", "sales_person_id","sales_month")
-    final_sales_team_data_mart = final_sales_team_data_mart_df\
-        .withColumn("sales_month", substring(col("sales_date"), 1, 7)) \
-        .withColumn("total_sales_every_month", sum("total_cost").over(window)) \
-        .select("store_id", "sales_person_id", concat(col("sales_person_first_name"), lit(" "), col("sales_person_last_name")).alias("full_name"),
-                "sales_month", "total_sales_every_month") \
-        .distinct()
-    
-    rank_window = Window.partitionBy("store_id", "sales_month").orderBy(col("total_sales_every_month").desc())
-
-    final_sales_team_data_mart = final_sales_team_data_mart.withColumn("rank", rank().over(rank_window)) \
-                                .withColumn("rnk", rank().over(rank_window)) \
-                                .withColumn("incentive", when(col("rnk") == 1,
-                                                                col("total_sales_every_month")*0.01).otherwise(0)) \
-                                .withColumn("total_sales", col("total_sales_every_month")) \
-                                .select("store_id", "sales_person_id", "full_name", "sales_month", "total_sales", "incentive")
-    final_sales_team_data_mart.show()
+def sales_mart_calculation_table_write(sales_rollup_df, batch_id):
+    batch_sales_team_data_mart = sales_team_totals_from_rollup(sales_rollup_df)
+    preview(batch_sales_team_data_mart, "sales team data mart")
     print("Writing the data into MySQL sales_team_data_mart table")
     db_writer = DatabaseWriter(url=config.url, properties=config.properties)
-    db_writer.write_dataframe(final_sales_team_data_mart, config.sales_team_data_mart_table)
+    MartUpserter(config.database_name).upsert_sales_team_mart(
+        config.sales_team_data_mart_table, config.sales_team_data_mart_stage_table, batch_id,
+        lambda stage_table: db_writer.write_dataframe(batch_sales_team_data_mart, stage_table))
@@ -0,0 +1,42 @@
+from pyspark.sql.functions import *
+
+#Columns of the shared rollup, one row per customer, store, sales person and month
+rollup_columns = ["customer_id", "store_id", "sales_person_id", "sales_month",
+                  "customer_full_name", "address", "phone_number",
+                  "sales_person_full_name", "total_sales"]
+
+
+#Aggregate the enriched join once to (customer, store, sales person, month).
+#Both data marts are derived from this rollup, so the detail rows are
+#shuffled a single time. Names and contact details depend on the ids only,
+#first() just carries them along.
+def build_sales_rollup(enriched_df):
+    return enriched_df\
+        .withColumn("sales_month", substring(col("sales_date"), 1, 7))\
+        .groupBy("customer_id", "store_id", "sales_person_id", "sales_month")\
+        .agg(first(concat(col("first_name"), lit(" "), col("last_name"))).alias("customer_full_name"),
+             first("address").alias("address"),
+             first("phone_number").alias("phone_number"),
+             first(concat(col("sales_person_first_name"), lit(" "), col("sales_person_last_name")))
+             .alias("sales_person_full_name"),
+             sum("total_cost").alias("total_sales"))\
+        .select(*rollup_columns)
+
+
+#Total purchase of every customer per month, columns of customers_data_mart
+def customer_mart_from_rollup(rollup_df):
+    return rollup_df.groupBy("customer_id", "sales_month")\
+        .agg(first("customer_full_name").alias("full_name"),
+             first("address").alias("address"),
+             first("phone_number").alias("phone_number"),
+             sum("total_sales").alias("total_sales"))\
+        .select("customer_id", "full_name", "address", "phone_number",
+                col("sales_month").alias("sales_date_month"), "total_sales")
+
+
+#Total sales of every sales person per month, the incentive is ranked in MySQL (MartUpserter)
+def sales_team_totals_from_rollup(rollup_df):
+    return rollup_df.groupBy("store_id", "sales_person_id", "sales_month")\
+        .agg(first("sales_person_full_name").alias("full_name"),
+             sum("total_sales").alias("total_sales"))\
+        .select("store_id", "sales_person_id", "full_name", "sales_month", "total_sales")
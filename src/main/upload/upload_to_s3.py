@@ -1,24 +1,81 @@
 from src.main.utility.logging_config import *
+from src.main.utility.s3_transfer import get_transfer_config, compute_s3_etag
+from resources import config
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import traceback
 import datetime
+import json
 import os
 
+MANIFEST_FILE_NAME = "_manifest.json"
+
 class UploadToS3:
-    def __init__(self,s3_client):
+    def __init__(self,s3_client, max_workers=None):
         self.s3_client = s3_client
+        self.max_workers = max_workers or config.s3_upload_max_workers
+        self.transfer_config = get_transfer_config()
+
+    #Spark bookkeeping files that consumers never read
+    def _is_spark_marker(self, file_name):
+        return file_name.startswith("_SUCCESS") or file_name.endswith(".crc") \
+            or file_name.startswith("._")
+
+    #Upload every file under local_directory to s3_prefix using a worker pool.
+    #keep_relative_paths keeps sub folders (e.g. sales_month=.../store_id=...) in the key.
+    #The manifest lists key, size and checksum of each file and is uploaded last,
+    #so its presence marks a complete snapshot.
+    def upload_directory(self, local_directory, s3_bucket, s3_prefix, keep_relative_paths=True,
+                         skip_spark_markers=None, write_manifest=True):
+        if skip_spark_markers is None:
+            skip_spark_markers = config.s3_upload_skip_spark_markers
+        s3_prefix = s3_prefix.rstrip("/")
+
+        uploads = []
+        for root, dirs, files in os.walk(local_directory):
+            for file in files:
+                if skip_spark_markers and self._is_spark_marker(file):
+                    continue
+                local_file_path = os.path.join(root, file)
+                if keep_relative_paths:
+                    relative_path = os.path.relpath(local_file_path, local_directory).replace(os.sep, "/")
+                else:
+                    relative_path = file
+                uploads.append((local_file_path, f"{s3_prefix}/{relative_path}"))
+
+        def upload(local_file_path, s3_key):
+            self.s3_client.upload_file(local_file_path, s3_bucket, s3_key, Config=self.transfer_config)
+            return {"key": s3_key,
+                    "size": os.path.getsize(local_file_path),
+                    "checksum": compute_s3_etag(local_file_path)}
+
+        manifest = []
+        if uploads:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(uploads))) as executor:
+                futures = [executor.submit(upload, path, key) for path, key in uploads]
+                for future in as_completed(futures):
+                    manifest.append(future.result())
+        manifest.sort(key=lambda entry: entry["key"])
+
+        if write_manifest:
+            body = json.dumps({"prefix": s3_prefix,
+                               "created_at": datetime.datetime.now().isoformat(),
+                               "file_count": len(manifest),
+                               "total_bytes": sum(entry["size"] for entry in manifest),
+                               "files": manifest}, indent=2)
+            self.s3_client.put_object(Bucket=s3_bucket, Key=f"{s3_prefix}/{MANIFEST_FILE_NAME}",
+                                      Body=body.encode("utf-8"), ContentType="application/json")
+        logger.info("Uploaded %s files (%s bytes) to s3://%s/%s", len(manifest),
+                    sum(entry["size"] for entry in manifest), s3_bucket, s3_prefix)
+        return manifest
 
     def upload_to_s3(self,s3_directory,s3_bucket,local_file_path):
         current_epoch = int(datetime.datetime.now().timestamp()) * 1000
         s3_prefix = f"{s3_directory}/{current_epoch}/"
         try:
-            for root, dirs, files in os.walk(local_file_path):
-                for file in files:
-                    local_file_path = os.path.join(root, file)
-                    s3_key = f"{s3_prefix}/{file}"
-                    self.s3_client.upload_file(local_file_path, s3_bucket, s3_key)
+            self.upload_directory(local_file_path, s3_bucket, s3_prefix, keep_relative_paths=False)
             return f"Data Successfully uploaded in {s3_directory} data mart "
         except Exception as e:
             logger.error(f"Error uploading file : {str(e)}")
             traceback_message = traceback.format_exc()
             print(traceback_message)
-            raise e
\ No newline at end of file
+            raise e
@@ -0,0 +1,159 @@
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import threading
+from src.main.utility.logging_config import *
+
+STATE_FILE_NAME = "state.json"
+
+
+#Durable record of which pipeline stages already finished for one batch of files.
+#A batch is identified by its file names and ETags, so a rerun over the same
+#files finds the checkpoint again and resumes at the first incomplete stage.
+class PipelineCheckpoint:
+    def __init__(self, checkpoint_directory, batch_files):
+        self.checkpoint_directory = checkpoint_directory
+        self.batch_files = dict(sorted(batch_files.items()))
+        self.batch_id = self.batch_id_for(self.batch_files)
+        self.directory = os.path.join(checkpoint_directory, self.batch_id)
+        self.state_path = os.path.join(self.directory, STATE_FILE_NAME)
+        self.lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self.state = self._load_state()
+        completed = [stage for stage in self.state["stages"]]
+        if completed:
+            logger.info(f"Resuming batch {self.batch_id}, completed stages: {completed}")
+        else:
+            logger.info(f"Starting batch {self.batch_id} with {len(self.batch_files)} files")
+
+    @staticmethod
+    def batch_id_for(batch_files):
+        payload = json.dumps(sorted(batch_files.items())).encode("utf-8")
+        return hashlib.sha1(payload).hexdigest()[:16]
+
+    #(batch_id, state) of every batch recorded under checkpoint_directory
+    @staticmethod
+    def _batch_states(checkpoint_directory):
+        if not os.path.isdir(checkpoint_directory):
+            return
+        for batch_id in sorted(os.listdir(checkpoint_directory)):
+            state_path = os.path.join(checkpoint_directory, batch_id, STATE_FILE_NAME)
+            if not os.path.exists(state_path):
+                continue
+            with open(state_path) as f:
+                yield batch_id, json.load(f)
+
+    #A batch whose staging rows were set to 'I' but whose source files were not all
+    #moved to the processed folder yet
+    @staticmethod
+    def _move_unfinished(state):
+        return "staging_table_updated" in state["stages"] and "source_files_moved" not in state["stages"]
+
+    #Look for an unfinished batch whose files are all part of the current listing.
+    #Returns its {file_name: etag} so the rerun covers exactly those files.
+    @staticmethod
+    def find_pending(checkpoint_directory, available_files):
+        for batch_id, state in PipelineCheckpoint._batch_states(checkpoint_directory):
+            files = state["files"]
+            if files and all(available_files.get(name) == etag for name, etag in files.items()):
+                return files
+        return None
+
+    #Batches that failed while moving their source files, {batch_id: [file_name, ...]}.
+    #Part of their files may already be in the processed folder, the rest has to follow.
+    @staticmethod
+    def find_unfinished_moves(checkpoint_directory):
+        return {batch_id: list(state["files"])
+                for batch_id, state in PipelineCheckpoint._batch_states(checkpoint_directory)
+                if PipelineCheckpoint._move_unfinished(state)}
+
+    @staticmethod
+    def remove(checkpoint_directory, batch_id):
+        shutil.rmtree(os.path.join(checkpoint_directory, batch_id), ignore_errors=True)
+        logger.info(f"Checkpoint: removed batch {batch_id}")
+
+    #Remove the checkpoints of batches whose files left the source listing, find_pending
+    #can never match them again. Batches with an unfinished move are kept, their
+    #remaining files are moved with find_unfinished_moves.
+    @staticmethod
+    def remove_stale(checkpoint_directory, listed_files):
+        removed = []
+        for batch_id, state in PipelineCheckpoint._batch_states(checkpoint_directory):
+            if PipelineCheckpoint._move_unfinished(state):
+                continue
+            if any(name not in listed_files for name in state["files"]):
+                shutil.rmtree(os.path.join(checkpoint_directory, batch_id), ignore_errors=True)
+                removed.append(batch_id)
+                logger.info(f"Checkpoint: removed stale batch {batch_id}, its files left the source folder")
+        return removed
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                return json.load(f)
+        return {"batch_id": self.batch_id,
+                "files": self.batch_files,
+                "created_at": datetime.datetime.now().isoformat(),
+                "stages": {}}
+
+    def _save_state(self):
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.state, f, indent=2, default=str)
+        os.replace(temp_path, self.state_path)
+
+    def is_complete(self, stage):
+        with self.lock:
+            return stage in self.state["stages"]
+
+    def details(self, stage):
+        with self.lock:
+            return self.state["stages"].get(stage, {}).get("details", {})
+
+    def mark_complete(self, stage, **details):
+        with self.lock:
+            self.state["stages"][stage] = {"completed_at": datetime.datetime.now().isoformat(),
+                                           "details": details}
+            self._save_state()
+        logger.info(f"Checkpoint: stage {stage} complete for batch {self.batch_id}")
+
+    #Directory where a stage keeps its durable output
+    def stage_path(self, stage):
+        return os.path.join(self.directory, stage)
+
+    #Materialise a stage output once with write(result, path) and load it with
+    #read(path) on every later run. Reading the copy also cuts the upstream lineage.
+    def materialize(self, stage, build, write, read):
+        path = self.stage_path(stage)
+        if self.is_complete(stage):
+            logger.info(f"Checkpoint: reading {stage} from {path}")
+            return read(path)
+        write(build(), path)
+        self.mark_complete(stage, path=path)
+        return read(path)
+
+    def dataframe(self, spark, stage, build_df):
+        return self.materialize(stage, build_df,
+                                lambda df, path: df.write.mode("overwrite").parquet(path),
+                                spark.read.parquet)
+
+    #Record a stage output that already lives outside the checkpoint (e.g. in the
+    #parsed source file cache) as the list of paths build_paths() returns. Later
+    #runs reuse the list as long as every path is still there.
+    def reference(self, stage, build_paths):
+        if self.is_complete(stage):
+            paths = self.details(stage).get("paths", [])
+            if all(os.path.isdir(path) for path in paths):
+                logger.info(f"Checkpoint: reusing the {len(paths)} paths recorded for {stage}")
+                return paths
+            logger.info(f"Checkpoint: a path recorded for {stage} is gone, rebuilding it")
+        paths = build_paths()
+        self.mark_complete(stage, paths=paths)
+        return paths
+
+    #Remove the whole batch once every stage finished
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        logger.info(f"Checkpoint: batch {self.batch_id} finished, checkpoint removed")
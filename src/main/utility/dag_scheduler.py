@@ -0,0 +1,117 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from src.main.utility.logging_config import *
+
+
+#Runs a graph of stages, every stage starts as soon as the stages it depends on
+#finished and at most max_workers stages run at the same time. After a failure
+#no new stage is started, the running ones finish and the first error is raised.
+class DagScheduler:
+    def __init__(self, max_workers, name="pipeline"):
+        self.max_workers = max_workers
+        self.name = name
+        self.stages = {}
+        self.timings = {}
+
+    def add_stage(self, name, work, depends_on=()):
+        if name in self.stages:
+            raise ValueError(f"Stage {name} is already part of {self.name}")
+        self.stages[name] = {"work": work, "depends_on": list(depends_on)}
+        return name
+
+    #Stages in dependency order, raises ValueError on unknown stages and cycles
+    def _topological_order(self):
+        for name, stage in self.stages.items():
+            unknown = [dependency for dependency in stage["depends_on"] if dependency not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {name} depends on unknown stages {unknown}")
+        order = []
+        remaining = {name: set(stage["depends_on"]) for name, stage in self.stages.items()}
+        while remaining:
+            ready = sorted(name for name, dependencies in remaining.items() if not dependencies)
+            if not ready:
+                raise ValueError(f"Cycle between the stages {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+                order.append(name)
+            for dependencies in remaining.values():
+                dependencies.difference_update(ready)
+        return order
+
+    def _run_stage(self, name):
+        started = time.perf_counter()
+        self.timings[name] = {"started": started - self.start, "status": "running"}
+        try:
+            result = self.stages[name]["work"]()
+            self.timings[name]["status"] = "success"
+            return result
+        except BaseException:
+            self.timings[name]["status"] = "failed"
+            raise
+        finally:
+            self.timings[name]["seconds"] = time.perf_counter() - started
+            self.timings[name]["finished"] = time.perf_counter() - self.start
+
+    #Returns {stage name: result of its work}
+    def run(self):
+        self._topological_order()
+        self.start = time.perf_counter()
+        self.timings = {}
+        waiting = {name: set(stage["depends_on"]) for name, stage in self.stages.items()}
+        results = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name) as executor:
+            running = {}
+            while waiting or running:
+                if error is None:
+                    for name in sorted(name for name, dependencies in waiting.items() if not dependencies):
+                        del waiting[name]
+                        running[executor.submit(self._run_stage, name)] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        logger.error(f"Stage {name} of {self.name} failed : {str(e)}")
+                        error = error or e
+                        continue
+                    for dependencies in waiting.values():
+                        dependencies.discard(name)
+        self.wall_seconds = time.perf_counter() - self.start
+        self.log_report()
+        if error is not None:
+            raise error
+        return results
+
+    #Longest chain of dependent stages by measured duration, the wall time
+    #of the run cannot go below it however much runs in parallel
+    def critical_path(self):
+        chain = {}
+        for name in self._topological_order():
+            if name not in self.timings:
+                continue
+            previous = max((chain[dependency] for dependency in self.stages[name]["depends_on"]
+                            if dependency in chain), key=lambda item: item[0], default=(0.0, []))
+            chain[name] = (previous[0] + self.timings[name]["seconds"], previous[1] + [name])
+        if not chain:
+            return [], 0.0
+        seconds, path = max(chain.values(), key=lambda item: item[0])
+        return path, seconds
+
+    def report(self):
+        path, seconds = self.critical_path()
+        return {"name": self.name,
+                "max_workers": self.max_workers,
+                "wall_seconds": getattr(self, "wall_seconds", None),
+                "critical_path": path,
+                "critical_path_seconds": seconds,
+                "stages": {name: {**self.timings[name], "depends_on": self.stages[name]["depends_on"]}
+                           for name in self.timings}}
+
+    def log_report(self):
+        path, seconds = self.critical_path()
+        logger.info(f"{self.name}: {len(self.timings)} stages in {self.wall_seconds:.2f}s, "
+                    f"critical path {seconds:.2f}s: {' -> '.join(path)}")
@@ -0,0 +1,70 @@
+import threading
+import time
+from pyspark import StorageLevel
+from src.main.utility.logging_config import *
+
+
+#Persists DataFrames that feed several actions and unpersists them once their
+#last consumer finished. Every persisted DataFrame is materialised with one
+#count() before its consumers start, so consumers running concurrently all read
+#the cache. That count is one computation of the lineage, with N consumers the
+#net saving is N - 1 recomputations of about the time the count took.
+class DataFrameCache:
+    def __init__(self, storage_level="MEMORY_AND_DISK"):
+        self.storage_level = getattr(StorageLevel, storage_level)
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    #With fewer than two consumers nothing would be reused, the DataFrame is returned as is
+    def persist(self, name, df, consumers):
+        if consumers < 2:
+            logger.info(f"Cache {name}: {consumers} consumer(s), not persisted")
+            return df
+        start = time.perf_counter()
+        df = df.persist(self.storage_level)
+        rows = df.count()
+        seconds = time.perf_counter() - start
+        with self.lock:
+            self.entries[name] = {"df": df, "remaining": consumers, "served": 0,
+                                  "rows": rows, "seconds": seconds}
+        logger.info(f"Cache {name}: persisted {rows} rows at {self.storage_level} in {seconds:.2f}s "
+                    f"for {consumers} consumers")
+        return df
+
+    #Wrap a consumer so the cache entry is released once it ran
+    def consumer(self, name, work):
+        def run(*args, **kwargs):
+            try:
+                return work(*args, **kwargs)
+            finally:
+                self.release(name)
+        return run
+
+    def release(self, name):
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is None:
+                return
+            entry["served"] += 1
+            entry["remaining"] -= 1
+            if entry["remaining"] > 0:
+                return
+            del self.entries[name]
+        self._unpersist(name, entry)
+
+    #Unpersist everything still cached, e.g. consumers skipped by a resumed run
+    def release_all(self):
+        with self.lock:
+            entries = list(self.entries.items())
+            self.entries.clear()
+        for name, entry in entries:
+            self._unpersist(name, entry)
+
+    def _unpersist(self, name, entry):
+        entry["df"].unpersist()
+        #The materialising count is the one computation every consumer shares,
+        #without the cache each served consumer would have computed the lineage once
+        saved = max(entry["served"] - 1, 0)
+        logger.info(f"Cache {name}: unpersisted after serving {entry['served']} consumers, "
+                    f"saved {saved} recomputations net (~{saved * entry['seconds']:.2f}s, "
+                    f"one computation took {entry['seconds']:.2f}s)")
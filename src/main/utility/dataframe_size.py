@@ -0,0 +1,22 @@
+from src.main.utility.logging_config import *
+
+
+#Size of the optimized plan as estimated by Spark, None when it is unknown.
+#Relations without statistics (e.g. a JDBC read) fall back to row_count times
+#the average row width Spark assumes for the schema, when the row count is known.
+def estimate_size_in_bytes(df, row_count=None):
+    try:
+        size = int(df._jdf.queryExecution().optimizedPlan().stats().sizeInBytes().toString())
+    except Exception as e:
+        logger.info(f"Could not estimate the dataframe size : {str(e)}")
+        size = None
+    #Spark reports Long.MaxValue (spark.sql.defaultSizeInBytes) when it has no statistics
+    if size is not None and size < 2 ** 62:
+        return size
+    if row_count is None:
+        return None
+    try:
+        return row_count * int(df._jdf.schema().defaultSize())
+    except Exception as e:
+        logger.info(f"Could not estimate the row width : {str(e)}")
+        return None
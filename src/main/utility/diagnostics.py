@@ -0,0 +1,34 @@
+from resources import config
+from src.main.utility.dataframe_size import estimate_size_in_bytes
+from src.main.utility.logging_config import *
+
+
+#Row count from the optimizer statistics, None when Spark has none.
+#Cached DataFrames are counted from the cache.
+def estimate_row_count(df):
+    if df.is_cached:
+        return df.count()
+    try:
+        row_count = df._jdf.queryExecution().optimizedPlan().stats().rowCount()
+        if row_count.isDefined():
+            return int(row_count.get().toString())
+    except Exception as e:
+        logger.info(f"Could not estimate the row count : {str(e)}")
+    return None
+
+
+#Opt-in replacement for df.show(). With diagnostics_enabled off (production)
+#nothing runs on Spark. Otherwise a cached DataFrame is shown as is and any
+#other one from a sample, limited to diagnostics_preview_rows rows.
+def preview(df, label, rows=None):
+    if not config.diagnostics_enabled:
+        return
+    rows = rows or config.diagnostics_preview_rows
+    row_count = estimate_row_count(df)
+    size = estimate_size_in_bytes(df)
+    logger.info(f"Preview of {label}: "
+                f"{'unknown' if row_count is None else row_count} rows, "
+                f"{'unknown' if size is None else size} bytes estimated")
+    source = df if df.is_cached else df.sample(withReplacement=False,
+                                               fraction=config.diagnostics_sample_fraction)
+    source.limit(rows).show(rows, truncate=False)
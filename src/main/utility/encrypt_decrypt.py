@@ -2,7 +2,7 @@ import base64
 from Cryptodome.Cipher import AES
 from Cryptodome.Protocol.KDF import PBKDF2
 import os, sys
-from resources.dev import config
+from resources import config
 # from logging_config import logger
 
 try:
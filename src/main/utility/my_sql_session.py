@@ -1,52 +1,65 @@
+import threading
+import time
+from contextlib import contextmanager
 import mysql.connector
-
+from mysql.connector import pooling
+from mysql.connector.errors import PoolError
+from resources import config
+from src.main.utility.logging_config import *
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+#One bounded pool per process, created on first use from the config
+def get_connection_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name=config.mysql_pool_name,
+                    pool_size=config.mysql_pool_size,
+                    pool_reset_session=True,
+                    host=config.mysql_host,
+                    port=config.mysql_port,
+                    user=config.properties["user"],
+                    password=config.properties["password"],
+                    database=config.database_name,
+                    allow_local_infile=config.mysql_allow_local_infile
+                )
+                logger.info("MySQL connection pool %s created with %s connections",
+                            config.mysql_pool_name, config.mysql_pool_size)
+    return _pool
+
+
+#Check a connection out of the pool, waiting up to mysql_pool_timeout seconds
+#when every connection is in use. Connections are pinged (and reconnected)
+#before they are handed out. close() returns the connection to the pool.
 def get_mysql_connection():
-    connection = mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",
-        database="de_project"
-    )
+    pool = get_connection_pool()
+    deadline = time.monotonic() + config.mysql_pool_timeout
+    while True:
+        try:
+            connection = pool.get_connection()
+            break
+        except PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+    try:
+        connection.ping(reconnect=True, attempts=3, delay=1)
+    except Exception:
+        connection.close()
+        raise
     return connection
 
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-# connection = mysql.connector.connect(
-#     host="localhost",
-#     user="root",
-#     password="password",
-#     database="manish"
-# )
-#
-# # Check if the connection is successful
-# if connection.is_connected():
-#     print("Connected to MySQL database")
-#
-# cursor = connection.cursor()
-#
-# # Execute a SQL query
-# query = "SELECT * FROM manish.testing"
-# cursor.execute(query)
-#
-# # Fetch and print the results
-# for row in cursor.fetchall():
-#     print(row)
-#
-# # Close the cursor
-# cursor.close()
-#
-# connection.close()
+#with mysql_connection() as connection: ... returns the connection to the pool afterwards
+@contextmanager
+def mysql_connection():
+    connection = get_mysql_connection()
+    try:
+        yield connection
+    finally:
+        connection.close()
@@ -2,14 +2,16 @@ import boto3
 
 
 class S3ClientProvider:
-    def __init__(self, aws_access_key=None, aws_secret_key=None):
+    def __init__(self, aws_access_key=None, aws_secret_key=None, endpoint_url=None):
         self.aws_access_key = aws_access_key
         self.aws_secret_key = aws_secret_key
+        self.endpoint_url = endpoint_url
         self.session = boto3.Session(
             aws_access_key_id=self.aws_access_key,
             aws_secret_access_key=self.aws_secret_key
         )
-        self.s3_client = self.session.client('s3')
+        #endpoint_url points the client at a local S3 stand-in such as moto server
+        self.s3_client = self.session.client('s3', endpoint_url=self.endpoint_url)
 
     def get_client(self):
         return self.s3_client
\ No newline at end of file
@@ -0,0 +1,43 @@
+import hashlib
+import os
+from boto3.s3.transfer import TransferConfig
+from resources import config
+
+MB = 1024 * 1024
+
+#Shared multipart / range settings for every upload and download
+def get_transfer_config():
+    return TransferConfig(multipart_threshold=config.s3_multipart_threshold_mb * MB,
+                          multipart_chunksize=config.s3_multipart_chunksize_mb * MB,
+                          max_concurrency=config.s3_transfer_max_concurrency,
+                          use_threads=True)
+
+#Rebuild the S3 ETag of a local file. Single part uploads use the plain md5,
+#multipart uploads use md5 of the part digests followed by "-<parts>".
+def compute_s3_etag(file_path, part_count=None, chunk_size=None):
+    chunk_size = chunk_size or config.s3_multipart_chunksize_mb * MB
+    if not part_count:
+        md5 = hashlib.md5()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(MB), b""):
+                md5.update(block)
+        return md5.hexdigest()
+
+    #Part size is not stored by S3, derive it from the part count when possible
+    file_size = os.path.getsize(file_path)
+    if part_count > 1 and -(-file_size // chunk_size) != part_count:
+        chunk_size = -(-file_size // part_count)
+        chunk_size = -(-chunk_size // MB) * MB
+    digests = []
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digests.append(hashlib.md5(block).digest())
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+#True when the local file has the same size and ETag as the S3 object
+def local_file_matches(file_path, size, etag):
+    if not os.path.isfile(file_path) or os.path.getsize(file_path) != size:
+        return False
+    etag = etag.strip('"')
+    part_count = int(etag.split("-")[1]) if "-" in etag else None
+    return compute_s3_etag(file_path, part_count) == etag
@@ -1,15 +1,71 @@
+import math
 import findspark
 findspark.init()
 from pyspark.sql import SparkSession
 from pyspark.sql import *
 from pyspark.sql.functions import *
 from pyspark.sql.types import *
+from resources import load_config
 from src.main.utility.logging_config import *
 
-def spark_session():
-    spark = SparkSession.builder.master("local[*]") \
-        .appName("shrey_sparks")\
-        .config("spark.driver.extraClassPath", "C:\\my_sql_jar\\mysql-connector-java-8.0.26.jar") \
-        .getOrCreate()
-    logger.info("spark session %s",spark)
-    return spark
\ No newline at end of file
+GB = 1024 * 1024 * 1024
+
+#One shuffle partition per spark_target_partition_bytes of input. Adaptive
+#execution still coalesces them, this only sets the starting point.
+def shuffle_partitions_for(input_bytes, profile):
+    partitions = math.ceil(input_bytes / profile.spark_target_partition_bytes)
+    return max(profile.spark_min_shuffle_partitions, min(profile.spark_max_shuffle_partitions, partitions))
+
+
+def driver_memory_gb_for(input_bytes, profile):
+    memory_gb = math.ceil(input_bytes * profile.spark_driver_memory_input_multiplier / GB)
+    return max(profile.spark_driver_memory_min_gb, min(profile.spark_driver_memory_max_gb, memory_gb))
+
+
+#Session sized for the batch: input_bytes is the size of the files to process,
+#without it the profile minimums are used. Driver memory only applies when
+#this call starts the JVM.
+def spark_session(input_bytes=None, environment=None):
+    profile = load_config(environment)
+    input_bytes = input_bytes or 0
+    shuffle_partitions = shuffle_partitions_for(input_bytes, profile)
+    driver_memory_gb = driver_memory_gb_for(input_bytes, profile)
+    builder = SparkSession.builder.master(profile.spark_master) \
+        .appName(profile.spark_app_name)\
+        .config("spark.driver.memory", f"{driver_memory_gb}g") \
+        .config("spark.sql.shuffle.partitions", str(shuffle_partitions)) \
+        .config("spark.sql.adaptive.enabled", "true") \
+        .config("spark.sql.adaptive.coalescePartitions.enabled", "true") \
+        .config("spark.sql.adaptive.advisoryPartitionSizeInBytes", str(profile.spark_target_partition_bytes)) \
+        .config("spark.sql.adaptive.skewJoin.enabled", "true") \
+        .config("spark.serializer", "org.apache.spark.serializer.KryoSerializer") \
+        .config("spark.kryoserializer.buffer.max", profile.spark_kryo_buffer_max)
+    #Packages are resolved from Maven at start up, hadoop-aws is only needed to read s3a:// paths
+    packages = list(profile.spark_packages)
+    if profile.ingestion_mode == "s3a":
+        packages.append(profile.spark_s3a_packages)
+    if packages:
+        builder = builder.config("spark.jars.packages", ",".join(packages))
+    if profile.spark_mysql_jar:
+        builder = builder.config("spark.driver.extraClassPath", profile.spark_mysql_jar)
+    for key, value in profile.spark_extra_conf.items():
+        builder = builder.config(key, value)
+    spark = builder.getOrCreate()
+    logger.info("spark session %s", spark)
+    logger.info(f"Spark sized for {input_bytes} input bytes: {shuffle_partitions} shuffle partitions, "
+                f"{driver_memory_gb}g driver memory, master {profile.spark_master}")
+    return spark
+
+#Let executors read s3a:// paths straight from the bucket.
+#endpoint_url is only set for local stand-ins such as moto server.
+def configure_s3a(spark, aws_access_key, aws_secret_key, endpoint_url=None):
+    hadoop_conf = spark.sparkContext._jsc.hadoopConfiguration()
+    hadoop_conf.set("fs.s3a.impl", "org.apache.hadoop.fs.s3a.S3AFileSystem")
+    hadoop_conf.set("fs.s3a.access.key", aws_access_key)
+    hadoop_conf.set("fs.s3a.secret.key", aws_secret_key)
+    if endpoint_url:
+        hadoop_conf.set("fs.s3a.endpoint", endpoint_url)
+        hadoop_conf.set("fs.s3a.path.style.access", "true")
+        hadoop_conf.set("fs.s3a.connection.ssl.enabled", str(endpoint_url.startswith("https")).lower())
+    logger.info("s3a configured for endpoint %s", endpoint_url or "AWS default")
+    return spark
@@ -0,0 +1,151 @@
+import datetime
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from src.main.utility.logging_config import *
+
+#Prometheus metric name, help text and record field of every stage measurement
+PROMETHEUS_METRICS = [
+    ("etl_stage_wall_seconds", "Wall clock time of a pipeline stage", "wall_seconds"),
+    ("etl_stage_cpu_seconds", "Driver CPU time of the thread that ran a pipeline stage", "cpu_seconds"),
+    ("etl_stage_rows_in", "Rows read by a pipeline stage", "rows_in"),
+    ("etl_stage_rows_out", "Rows written by a pipeline stage", "rows_out"),
+    ("etl_stage_bytes_read", "Bytes read by a pipeline stage", "bytes_read"),
+    ("etl_stage_bytes_written", "Bytes written by a pipeline stage", "bytes_written"),
+]
+
+
+#Total size of the files below path, 0 when it does not exist
+def path_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            total += os.path.getsize(os.path.join(root, file))
+    return total
+
+
+#Measurements of one stage, rows and bytes are filled in by the stage itself
+class StageRecord:
+    def __init__(self, name):
+        self.name = name
+        self.status = "running"
+        self.started_at = datetime.datetime.now().isoformat()
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.rows_in = None
+        self.rows_out = None
+        self.bytes_read = None
+        self.bytes_written = None
+        self.error = None
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+#Collects wall time, CPU time, rows and bytes of every stage of one run and
+#writes them as a JSON run report and a Prometheus text file (for the
+#node_exporter textfile collector). CPU time is that of the Python driver
+#process, work done inside the Spark JVM is not part of it.
+class StageMetrics:
+    def __init__(self, run_id=None, labels=None):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.labels = labels or {}
+        self.started_at = datetime.datetime.now().isoformat()
+        self.start = time.perf_counter()
+        self.records = []
+        self.annotations = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        record = StageRecord(name)
+        with self.lock:
+            self.records.append(record)
+        wall_start = time.perf_counter()
+        #Stages of the DAG run concurrently, only the CPU time of this thread is its own
+        cpu_start = time.thread_time()
+        try:
+            yield record
+            record.status = "success"
+        except BaseException as e:
+            record.status = "failed"
+            record.error = str(e)
+            raise
+        finally:
+            record.wall_seconds = time.perf_counter() - wall_start
+            record.cpu_seconds = time.thread_time() - cpu_start
+            logger.info(f"Stage {name} {record.status} in {record.wall_seconds:.2f}s "
+                        f"(cpu {record.cpu_seconds:.2f}s, rows in/out {record.rows_in}/{record.rows_out}, "
+                        f"bytes read/written {record.bytes_read}/{record.bytes_written})")
+
+    #Wrap a callable as a stage. measure(record, result) may fill in rows and bytes.
+    def wrap(self, name, work, measure=None):
+        def run(*args, **kwargs):
+            with self.stage(name) as record:
+                result = work(*args, **kwargs)
+                if measure:
+                    measure(record, result)
+                return result
+        return run
+
+    #Extra sections of the JSON report, e.g. the critical path of a stage graph
+    def annotate(self, name, value):
+        with self.lock:
+            self.annotations[name] = value
+
+    def report(self):
+        with self.lock:
+            stages = [record.as_dict() for record in self.records]
+            annotations = dict(self.annotations)
+        return {"run_id": self.run_id,
+                "labels": self.labels,
+                "started_at": self.started_at,
+                "wall_seconds": time.perf_counter() - self.start,
+                "stages": stages,
+                **annotations}
+
+    #Series are labelled by stage and the static labels only, so every run
+    #overwrites the same series. The run id is exposed once, on etl_run_info.
+    def _prometheus_text(self, report):
+        def labels(extra):
+            pairs = {**self.labels, **extra}
+            return ",".join(f'{key}="{value}"' for key, value in pairs.items())
+
+        lines = [f"# HELP etl_run_info Run id of the pipeline run these metrics belong to",
+                 f"# TYPE etl_run_info gauge",
+                 f"etl_run_info{{{labels({'run_id': self.run_id})}}} 1",
+                 f"# HELP etl_run_wall_seconds Wall clock time of the pipeline run",
+                 f"# TYPE etl_run_wall_seconds gauge",
+                 f"etl_run_wall_seconds{{{labels({})}}} {report['wall_seconds']:.6f}",
+                 f"# HELP etl_stage_success 1 when the stage finished, 0 when it failed",
+                 f"# TYPE etl_stage_success gauge"]
+        for stage in report["stages"]:
+            lines.append(f"etl_stage_success{{{labels({'stage': stage['name']})}}} "
+                         f"{1 if stage['status'] == 'success' else 0}")
+        for metric, help_text, field in PROMETHEUS_METRICS:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            for stage in report["stages"]:
+                if stage[field] is not None:
+                    lines.append(f"{metric}{{{labels({'stage': stage['name']})}}} {stage[field]}")
+        return "\n".join(lines) + "\n"
+
+    #run_report_<run_id>.json is kept per run, the .prom file always holds the latest run
+    def write_reports(self, directory, prometheus_file_name="etl_pipeline.prom"):
+        os.makedirs(directory, exist_ok=True)
+        report = self.report()
+        json_path = os.path.join(directory, f"run_report_{self.run_id}.json")
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        prometheus_path = os.path.join(directory, prometheus_file_name)
+        temp_path = prometheus_path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write(self._prometheus_text(report))
+        os.replace(temp_path, prometheus_path)
+        logger.info(f"Run report written to {json_path}, metrics to {prometheus_path}")
+        return json_path, prometheus_path
@@ -1,17 +1,120 @@
+import glob
+import os
+import shutil
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pyspark.sql.functions import coalesce, col, concat_ws, lit, regexp_replace
+from resources import config
 from src.main.utility.logging_config import *
+from src.main.utility.my_sql_session import mysql_connection
+
+#(Java regex, replacement) pairs applied to every value before LOAD DATA,
+#the backslash has to come first
+LOAD_DATA_ESCAPES = [("\\\\", "\\\\\\\\"),
+                     ("\n", "\\\\n"),
+                     ("\r", "\\\\r"),
+                     ("\t", "\\\\t")]
 
 class DatabaseWriter:
-    def __init__(self,url,properties):
+    #bulk_mode "jdbc" writes with batched, rewritten INSERT statements from up to
+    #num_writers partitions, "load_data" stages the rows as CSV and runs
+    #LOAD DATA LOCAL INFILE (needs mysql_allow_local_infile and local_infile on the server)
+    def __init__(self,url,properties, bulk_mode=None, batch_size=None, num_writers=None):
         self.url = url
         self.properties = properties
+        self.bulk_mode = bulk_mode or config.db_write_mode
+        self.batch_size = batch_size or config.db_write_batch_size
+        self.num_writers = num_writers or config.db_write_parallelism
+
+    #Connector/J only sends multi row INSERTs when rewriteBatchedStatements is on
+    def _bulk_url(self):
+        separator = "&" if "?" in self.url else "?"
+        return f"{self.url}{separator}rewriteBatchedStatements=true&useServerPrepStmts=false"
+
+    def _write_jdbc(self, df, table_name):
+        df.write.option("batchsize", str(self.batch_size))\
+            .option("numPartitions", str(self.num_writers))\
+            .jdbc(url=self._bulk_url(),
+                  table=table_name,
+                  mode="append",
+                  properties=self.properties)
+
+    #One tab separated line per row for LOAD DATA. It reads its escape sequences in
+    #every field, so backslashes are doubled and tabs and line breaks are escaped,
+    #NULL is written as \N. Nothing is quoted, the CSV writer would wrap values
+    #holding its quote character (NUL when quoting is "off") in stray characters.
+    def _load_data_lines(self, df):
+        def escape(column):
+            value = col(column).cast("string")
+            for pattern, replacement in LOAD_DATA_ESCAPES:
+                value = regexp_replace(value, pattern, replacement)
+            return coalesce(value, lit("\\N"))
+        return df.select(concat_ws("\t", *[escape(column) for column in df.columns]).alias("value"))
+
+    #The part files are loaded in parallel into a work table, which is then
+    #appended to table_name in one transaction. A failed part leaves table_name untouched.
+    def _write_load_data(self, df, table_name):
+        load_id = uuid.uuid4().hex
+        staging_path = os.path.join(config.db_bulk_load_staging_directory, f"{table_name}_{load_id}")
+        work_table = f"{table_name}_load_{load_id[:12]}"
+        columns = df.columns
+
+        def execute(statement):
+            with mysql_connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    cursor.execute(statement)
+                    connection.commit()
+                    return cursor.rowcount
+                finally:
+                    cursor.close()
+
+        try:
+            self._load_data_lines(df).coalesce(self.num_writers).write\
+                .option("lineSep", "\n")\
+                .mode("overwrite")\
+                .text(staging_path)
+            files = sorted(glob.glob(os.path.join(staging_path, "part-*")))
+            if not files:
+                return 0
+            execute(f"CREATE TABLE {work_table} LIKE {table_name}")
+
+            def load(file_path):
+                return execute(f"LOAD DATA LOCAL INFILE '{file_path.replace(os.sep, '/')}' "
+                               f"INTO TABLE {work_table} "
+                               f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+                               f"LINES TERMINATED BY '\\n' ({', '.join(columns)})")
+
+            with ThreadPoolExecutor(max_workers=min(self.num_writers, len(files))) as executor:
+                list(executor.map(load, files))
+            return execute(f"INSERT INTO {table_name} ({', '.join(columns)}) "
+                           f"SELECT {', '.join(columns)} FROM {work_table}")
+        finally:
+            try:
+                execute(f"DROP TABLE IF EXISTS {work_table}")
+            finally:
+                shutil.rmtree(staging_path, ignore_errors=True)
 
     def write_dataframe(self,df,table_name):
         try:
-            #print("inside write_dataframe")
-            df.write.jdbc(url=self.url,
-                          table=table_name,
-                          mode="append",
-                          properties=self.properties)
-            logger.info(f"Data successfully written into {table_name} table ")
+            start = time.perf_counter()
+            if self.bulk_mode == "load_data":
+                rows = self._write_load_data(df, table_name)
+            else:
+                #Counting is an extra Spark job, only worth it on cached or small data
+                rows = df.count() if config.db_write_report_rows else None
+                self._write_jdbc(df, table_name)
+            seconds = time.perf_counter() - start
+            if rows is None:
+                logger.info(f"Data successfully written into {table_name} table in {seconds:.2f}s")
+            else:
+                logger.info(f"Data successfully written into {table_name} table: {rows} rows in "
+                            f"{seconds:.2f}s ({rows / seconds if seconds else 0:.0f} rows/s)")
+            return rows
         except Exception as e:
-            return {f"Message: Error occured {e}"}
+            logger.error(f"Error writing into {table_name} table : {str(e)}")
+            traceback_message = traceback.format_exc()
+            print(traceback_message)
+            raise e
@@ -0,0 +1,106 @@
+import traceback
+from src.main.utility.logging_config import *
+from src.main.utility.my_sql_session import mysql_connection
+
+
+#Merge the monthly partial sums of one batch into the data mart tables.
+#The batch is loaded into a staging table first, then a single transaction adds
+#it to the existing totals with INSERT ... ON DUPLICATE KEY UPDATE and records
+#the batch id in mart_batch_log, so a batch is never applied twice.
+class MartUpserter:
+    def __init__(self, database_name, batch_log_table="mart_batch_log"):
+        self.database_name = database_name
+        self.batch_log_table = f"{database_name}.{batch_log_table}"
+
+    def _clear_stage(self, stage_table):
+        with mysql_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(f"DELETE FROM {self.database_name}.{stage_table}")
+                connection.commit()
+            finally:
+                cursor.close()
+
+    def _already_merged(self, batch_id, mart_table):
+        with mysql_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(f"SELECT 1 FROM {self.batch_log_table} WHERE batch_id = %s AND mart_table = %s",
+                               (batch_id, mart_table))
+                return cursor.fetchone() is not None
+            finally:
+                cursor.close()
+
+    #load_stage(stage_table) writes the batch rows into the staging table,
+    #statements run afterwards in one transaction. A batch found in the log is
+    #skipped before the staging table is touched.
+    def _merge(self, mart_table, stage_table, batch_id, load_stage, statements):
+        #An empty id would be logged once and every later call would be skipped
+        if not batch_id:
+            raise Exception(f"A batch id is required to merge into {mart_table}")
+        if self._already_merged(batch_id, mart_table):
+            logger.info(f"Batch {batch_id} was already merged into {mart_table}, skipping")
+            return False
+        self._clear_stage(stage_table)
+        load_stage(stage_table)
+        with mysql_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(f"INSERT IGNORE INTO {self.batch_log_table} (batch_id, mart_table, applied_at) "
+                               f"VALUES (%s, %s, NOW())", (batch_id, mart_table))
+                if cursor.rowcount == 0:
+                    logger.info(f"Batch {batch_id} was already merged into {mart_table}, skipping")
+                    connection.rollback()
+                    return False
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(f"DELETE FROM {self.database_name}.{stage_table}")
+                connection.commit()
+                logger.info(f"Batch {batch_id} merged into {mart_table}")
+                return True
+            except Exception as e:
+                connection.rollback()
+                logger.error(f"Error merging into {mart_table} : {str(e)}")
+                print(traceback.format_exc())
+                raise e
+            finally:
+                cursor.close()
+
+    def upsert_customer_mart(self, mart_table, stage_table, batch_id, load_stage):
+        mart = f"{self.database_name}.{mart_table}"
+        stage = f"{self.database_name}.{stage_table}"
+        merge = f"""INSERT INTO {mart} (customer_id, full_name, address, phone_number, sales_date_month, total_sales)
+                    SELECT customer_id, MAX(full_name), MAX(address), MAX(phone_number), sales_date_month, SUM(total_sales)
+                    FROM {stage}
+                    GROUP BY customer_id, sales_date_month
+                    ON DUPLICATE KEY UPDATE
+                        total_sales = {mart}.total_sales + VALUES(total_sales),
+                        full_name = VALUES(full_name),
+                        address = VALUES(address),
+                        phone_number = VALUES(phone_number)"""
+        return self._merge(mart_table, stage_table, batch_id, load_stage, [merge])
+
+    #Totals are merged first, then the incentive is ranked again only for the
+    #(store, month) groups present in this batch
+    def upsert_sales_team_mart(self, mart_table, stage_table, batch_id, load_stage):
+        mart = f"{self.database_name}.{mart_table}"
+        stage = f"{self.database_name}.{stage_table}"
+        merge = f"""INSERT INTO {mart} (store_id, sales_person_id, full_name, sales_month, total_sales, incentive)
+                    SELECT store_id, sales_person_id, MAX(full_name), sales_month, SUM(total_sales), 0
+                    FROM {stage}
+                    GROUP BY store_id, sales_person_id, sales_month
+                    ON DUPLICATE KEY UPDATE
+                        total_sales = {mart}.total_sales + VALUES(total_sales),
+                        full_name = VALUES(full_name)"""
+        rerank = f"""UPDATE {mart} m
+                     JOIN (SELECT r.store_id, r.sales_person_id, r.sales_month,
+                                  RANK() OVER (PARTITION BY r.store_id, r.sales_month
+                                               ORDER BY r.total_sales DESC) AS rnk
+                           FROM {mart} r
+                           JOIN (SELECT DISTINCT store_id, sales_month FROM {stage}) touched
+                             ON r.store_id = touched.store_id AND r.sales_month = touched.sales_month) ranked
+                       ON m.store_id = ranked.store_id
+                      AND m.sales_person_id = ranked.sales_person_id
+                      AND m.sales_month = ranked.sales_month
+                     SET m.incentive = CASE WHEN ranked.rnk = 1 THEN m.total_sales * 0.01 ELSE 0 END"""
+        return self._merge(mart_table, stage_table, batch_id, load_stage, [merge, rerank])
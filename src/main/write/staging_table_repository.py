@@ -0,0 +1,77 @@
+import traceback
+from src.main.utility.logging_config import *
+from src.main.utility.my_sql_session import mysql_connection
+
+IN_CLAUSE_BATCH_SIZE = 1000
+
+
+#Bookkeeping of source files in product_staging_table.
+#Every call is one transaction with parameterised, batched statements.
+class StagingTableRepository:
+    def __init__(self, database_name, table_name):
+        self.table = f"{database_name}.{table_name}"
+
+    #Run work(cursor) in one transaction on a pooled connection
+    def _run(self, work):
+        with mysql_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                result = work(cursor)
+                connection.commit()
+                return result
+            except Exception as e:
+                connection.rollback()
+                logger.error(f"Error updating {self.table} : {str(e)}")
+                print(traceback.format_exc())
+                raise e
+            finally:
+                cursor.close()
+
+    def _batches(self, file_names):
+        file_names = sorted(set(file_names))
+        for i in range(0, len(file_names), IN_CLAUSE_BATCH_SIZE):
+            yield file_names[i:i + IN_CLAUSE_BATCH_SIZE]
+
+    #File names among file_names that have the given status
+    def find_files_with_status(self, file_names, status):
+        def work(cursor):
+            found = set()
+            for batch in self._batches(file_names):
+                placeholders = ", ".join(["%s"] * len(batch))
+                cursor.execute(f"SELECT DISTINCT file_name FROM {self.table} "
+                               f"WHERE file_name IN ({placeholders}) AND status = %s",
+                               (*batch, status))
+                found.update(row[0] for row in cursor.fetchall())
+            return found
+        if not file_names:
+            return set()
+        return self._run(work)
+
+    def insert_files(self, file_names, status, created_date):
+        rows = [(name, name, created_date, status) for name in sorted(set(file_names))]
+        def work(cursor):
+            cursor.executemany(f"INSERT INTO {self.table} "
+                               f"(file_name, file_location, created_date, status) "
+                               f"VALUES (%s, %s, %s, %s)", rows)
+            return len(rows)
+        if not rows:
+            return 0
+        inserted = self._run(work)
+        logger.info(f"Inserted {inserted} files into {self.table} with status {status}")
+        return inserted
+
+    def update_status(self, file_names, status, updated_date):
+        def work(cursor):
+            updated = 0
+            for batch in self._batches(file_names):
+                placeholders = ", ".join(["%s"] * len(batch))
+                cursor.execute(f"UPDATE {self.table} SET status = %s, updated_date = %s "
+                               f"WHERE file_name IN ({placeholders})",
+                               (status, updated_date, *batch))
+                updated += cursor.rowcount
+            return updated
+        if not file_names:
+            return 0
+        updated = self._run(work)
+        logger.info(f"Updated {updated} rows of {self.table} to status {status}")
+        return updated
@@ -0,0 +1,227 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import boto3
+import mysql.connector
+from moto.server import ThreadedMotoServer
+from src.main.utility.encrypt_decrypt import encrypt
+from src.test.sales_data_generator import SalesDataGenerator
+
+#End to end benchmark of main.py against a moto S3 server and a local MySQL.
+#usage: python -m src.test.benchmark.benchmark_pipeline --scale 1m --mysql-password ...
+#Every scale runs the whole pipeline in its own process and records the total
+#and per stage wall time (from the stage metrics run report). Results are
+#compared with baseline.json, --update-baseline stores them as the new baseline.
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+TABLE_SCRIPTS = os.path.join(REPO_ROOT, "resources", "sql_scripts", "table_scripts.sql")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+#name: (rows, files, customers)
+SCALES = {
+    "10k": (10_000, 1, 25),
+    "1m": (1_000_000, 100, 10_000),
+    "10m": (10_000_000, 1_000, 100_000),
+    "100m": (100_000_000, 10_000, 1_000_000),
+}
+
+BUCKET_NAME = "etl-benchmark"
+AWS_KEY = "testing"
+#Resolved from Maven by Spark when no --mysql-jar is given
+MYSQL_CONNECTOR_PACKAGE = "com.mysql:mysql-connector-j:8.0.33"
+
+
+def mysql_connect(args, database=None):
+    return mysql.connector.connect(host=args.mysql_host, port=args.mysql_port, user=args.mysql_user,
+                                   password=args.mysql_password, database=database,
+                                   allow_local_infile=True)
+
+
+#Drop and recreate the benchmark database from table_scripts.sql, then add
+#synthetic customers until there are `customers` of them
+def reset_database(args, customers):
+    connection = mysql_connect(args)
+    cursor = connection.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {args.database}")
+    cursor.execute(f"CREATE DATABASE {args.database}")
+    cursor.execute(f"USE {args.database}")
+    with open(TABLE_SCRIPTS) as f:
+        script = "\n".join(line for line in f if not line.strip().startswith("--"))
+    for statement in script.split(";"):
+        if statement.strip():
+            cursor.execute(statement)
+    cursor.execute("SELECT COUNT(*) FROM customer")
+    existing = cursor.fetchone()[0]
+    rows = [(f"first_{i}", f"last_{i}", "Delhi", "122009", f"91{i:08d}", "2022-01-01")
+            for i in range(existing + 1, customers + 1)]
+    for i in range(0, len(rows), 10_000):
+        cursor.executemany("INSERT INTO customer (first_name, last_name, address, pincode, phone_number, "
+                           "customer_joining_date) VALUES (%s, %s, %s, %s, %s, %s)", rows[i:i + 10_000])
+    connection.commit()
+    cursor.close()
+    connection.close()
+
+
+def s3_client_for(endpoint_url):
+    return boto3.client("s3", endpoint_url=endpoint_url, aws_access_key_id=AWS_KEY,
+                        aws_secret_access_key=AWS_KEY, region_name="us-east-1")
+
+
+#Every scale starts from an empty moto server
+def empty_s3(endpoint_url):
+    s3_client = s3_client_for(endpoint_url)
+    for bucket in s3_client.list_buckets()["Buckets"]:
+        for page in s3_client.get_paginator("list_objects_v2").paginate(Bucket=bucket["Name"]):
+            for obj in page.get("Contents", []):
+                s3_client.delete_object(Bucket=bucket["Name"], Key=obj["Key"])
+        s3_client.delete_bucket(Bucket=bucket["Name"])
+
+
+def upload_sales_files(endpoint_url, paths, prefix):
+    s3_client = s3_client_for(endpoint_url)
+    s3_client.create_bucket(Bucket=BUCKET_NAME)
+    for path in paths:
+        s3_client.upload_file(path, BUCKET_NAME, f"{prefix}{os.path.basename(path)}")
+
+
+def scenario_overrides(args, workspace, endpoint_url):
+    directories = {name: os.path.join(workspace, name) + os.sep
+                   for name in ["local_directory", "customer_data_mart_local_file",
+                                "sales_team_data_mart_local_file", "sales_team_data_mart_partitioned_local_file",
+                                "error_folder_path_local", "source_cache_directory", "checkpoint_directory",
+                                "dimension_cache_directory", "db_bulk_load_staging_directory",
+                                "stage_metrics_directory"]}
+    for directory in directories.values():
+        os.makedirs(directory, exist_ok=True)
+    encrypted_key = encrypt(AWS_KEY).decode("utf-8")
+    return {**directories,
+            "aws_access_key": encrypted_key,
+            "aws_secret_key": encrypted_key,
+            "bucket_name": BUCKET_NAME,
+            "s3_endpoint_url": endpoint_url,
+            "database_name": args.database,
+            "url": f"jdbc:mysql://{args.mysql_host}:{args.mysql_port}/{args.database}",
+            "properties": {"user": args.mysql_user, "password": args.mysql_password,
+                           "driver": "com.mysql.cj.jdbc.Driver"},
+            "mysql_host": args.mysql_host,
+            "mysql_port": args.mysql_port,
+            "spark_mysql_jar": args.mysql_jar,
+            "spark_packages": [] if args.mysql_jar else [MYSQL_CONNECTOR_PACKAGE],
+            "execution_engine": args.engine,
+            "wait_for_exit_prompt": False}
+
+
+def run_scale(args, scale, rows, files, customers, endpoint_url):
+    workspace = os.path.join(args.workspace, scale)
+    shutil.rmtree(workspace, ignore_errors=True)
+    print(f"[{scale}] generating {rows} rows in {files} files")
+    #The default 3 stores with 3 sales persons each match the seeded store and sales_team tables
+    paths = SalesDataGenerator(os.path.join(workspace, "generated"), rows, shards=files, seed=args.seed,
+                               customers=customers, skew=args.skew).generate()
+    upload_sales_files(endpoint_url, paths, "sales_data/")
+    reset_database(args, customers)
+
+    overrides = scenario_overrides(args, workspace, endpoint_url)
+    overrides_path = os.path.join(workspace, "overrides.json")
+    with open(overrides_path, "w") as f:
+        json.dump(overrides, f, indent=2)
+
+    print(f"[{scale}] running the pipeline")
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "src.test.benchmark.run_pipeline", overrides_path],
+                   cwd=REPO_ROOT, env={**os.environ, "ETL_ENV": "dev"}, stdin=subprocess.DEVNULL, check=True)
+    wall_seconds = time.perf_counter() - start
+
+    reports = glob.glob(os.path.join(overrides["stage_metrics_directory"], "run_report_*.json"))
+    with open(reports[0]) as f:
+        report = json.load(f)
+    return {"rows": rows,
+            "files": files,
+            "wall_seconds": wall_seconds,
+            "rows_per_second": rows / wall_seconds,
+            "stages": {stage["name"]: stage["wall_seconds"] for stage in report["stages"]}}
+
+
+#Scales slower than the baseline by more than tolerance are regressions
+def compare(results, baseline, tolerance):
+    regressions = []
+    for scale, result in results.items():
+        expected = baseline.get(scale)
+        if expected is None:
+            print(f"[{scale}] {result['wall_seconds']:.1f}s, no baseline")
+            continue
+        change = result["wall_seconds"] / expected["wall_seconds"] - 1
+        print(f"[{scale}] {result['wall_seconds']:.1f}s vs baseline {expected['wall_seconds']:.1f}s ({change:+.1%})")
+        for stage, seconds in sorted(result["stages"].items(), key=lambda item: -item[1]):
+            before = expected["stages"].get(stage)
+            print(f"    {stage:<32} {seconds:8.2f}s" + ("" if before is None else f"  (baseline {before:.2f}s)"))
+        if change > tolerance:
+            regressions.append(scale)
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="End to end benchmark of the sales data pipeline")
+    parser.add_argument("--scale", action="append", choices=list(SCALES),
+                        help="scale to run, repeatable (default 10k)")
+    parser.add_argument("--rows", type=int, help="custom scale: number of rows")
+    parser.add_argument("--files", type=int, default=1, help="custom scale: number of files")
+    parser.add_argument("--customers", type=int, default=1_000, help="custom scale: number of customers")
+    parser.add_argument("--engine", default="auto", choices=["auto", "spark", "arrow"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skew", type=float, default=0.0, help="Zipf exponent of customer and product popularity")
+    parser.add_argument("--workspace", default=os.path.join(tempfile.gettempdir(), "etl_benchmark"))
+    parser.add_argument("--mysql-host", default="localhost")
+    parser.add_argument("--mysql-port", type=int, default=3306)
+    parser.add_argument("--mysql-user", default="root")
+    parser.add_argument("--mysql-password", default="")
+    parser.add_argument("--mysql-jar", default=None, help="MySQL connector jar for Spark, without it the connector is fetched from Maven")
+    parser.add_argument("--database", default="etl_benchmark")
+    parser.add_argument("--moto-port", type=int, default=5055)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--update-baseline", action="store_true")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    scenarios = {scale: SCALES[scale] for scale in (args.scale or ([] if args.rows else ["10k"]))}
+    if args.rows:
+        scenarios[f"custom_{args.rows}x{args.files}"] = (args.rows, args.files, args.customers)
+
+    server = ThreadedMotoServer(port=args.moto_port)
+    server.start()
+    endpoint_url = f"http://127.0.0.1:{args.moto_port}"
+    try:
+        results = {}
+        for scale, (rows, files, customers) in scenarios.items():
+            empty_s3(endpoint_url)
+            results[scale] = run_scale(args, scale, rows, files, customers, endpoint_url)
+    finally:
+        server.stop()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline updated at {args.baseline}")
+    elif regressions:
+        print(f"Regressions beyond {args.tolerance:.0%}: {regressions}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
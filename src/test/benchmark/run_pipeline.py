@@ -0,0 +1,24 @@
+import json
+import os
+import runpy
+import sys
+from resources import config
+
+#Runs main.py once with the settings of a benchmark scenario.
+#usage: python -m src.test.benchmark.run_pipeline <overrides.json>
+#Every module reads the settings through resources.config at call time,
+#so overriding its attributes before main.py starts redirects S3, MySQL and
+#all local directories to the benchmark workspace.
+
+MAIN_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "..", "main.py")
+
+
+def apply_overrides(overrides):
+    for name, value in overrides.items():
+        setattr(config, name, value)
+
+
+if __name__ == "__main__":
+    with open(sys.argv[1]) as f:
+        apply_overrides(json.load(f))
+    runpy.run_path(os.path.abspath(MAIN_PATH), run_name="__main__")
@@ -0,0 +1,168 @@
+import argparse
+import datetime
+import os
+from multiprocessing import Pool
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+#Synthetic sales data at benchmark scale.
+#Every column is sampled with NumPy for a whole shard at once and shards are
+#written by a pool of worker processes. Shard i always uses the seed (seed, i),
+#so the output only depends on the settings, not on the number of processes.
+#usage: python -m src.test.sales_data_generator --rows 10000000 --shards 100 --output ...
+
+product_data = {
+    "quaker oats": 212,
+    "sugar": 50,
+    "maida": 20,
+    "besan": 52,
+    "refined oil": 110,
+    "clinic plus": 1.5,
+    "dantkanti": 100,
+    "nutrella": 40
+}
+
+#Column layouts of the existing generators: standard, extra_column
+#(extra_column_csv_generated_data.py) and missing_column (less_column_csv_generated_data.py)
+variant_columns = {
+    "standard": ["customer_id", "store_id", "product_name", "sales_date", "sales_person_id",
+                 "price", "quantity", "total_cost"],
+    "extra_column": ["customer_id", "store_id", "product_name", "sales_date", "sales_person_id",
+                     "price", "quantity", "total_cost", "payment_mode"],
+    "missing_column": ["customer_id", "product_name", "sales_date", "sales_person_id",
+                       "price", "quantity", "total_cost", "payment_mode"],
+}
+
+FIRST_STORE_ID = 121
+
+
+class SalesDataGenerator:
+    #customers, stores and sales_persons_per_store set the id ranges: customers
+    #1..customers, stores from 121 and sales persons numbered per store
+    #(121: 1-3, 122: 4-6, ... with the defaults, as in the seeded sales_team table).
+    #products beyond the built in price list get synthetic names and prices.
+    #skew is the Zipf exponent of customer and product popularity, 0 is uniform.
+    def __init__(self, output_directory, rows, shards=1, file_format="csv", seed=42,
+                 customers=20, stores=3, sales_persons_per_store=3, products=len(product_data),
+                 start_date="2023-01-01", end_date="2023-12-31", skew=0.0, variant="standard",
+                 processes=None):
+        if variant not in variant_columns:
+            raise ValueError(f"Unknown variant {variant}, expected one of {list(variant_columns)}")
+        if file_format not in ("csv", "parquet"):
+            raise ValueError(f"Unknown file format {file_format}")
+        self.output_directory = output_directory
+        self.rows = rows
+        self.shards = shards
+        self.file_format = file_format
+        self.seed = seed
+        self.customers = customers
+        self.stores = stores
+        self.sales_persons_per_store = sales_persons_per_store
+        self.products = products
+        self.start_date = start_date
+        self.end_date = end_date
+        self.skew = skew
+        self.variant = variant
+        self.processes = processes
+
+    def settings(self):
+        return {name: value for name, value in self.__dict__.items() if name != "processes"}
+
+    #Shard sizes differ by at most one row
+    def shard_rows(self):
+        base, remainder = divmod(self.rows, self.shards)
+        return [base + (1 if i < remainder else 0) for i in range(self.shards)]
+
+    def generate(self):
+        os.makedirs(self.output_directory, exist_ok=True)
+        tasks = [(self.settings(), i, rows) for i, rows in enumerate(self.shard_rows())]
+        with Pool(processes=self.processes) as pool:
+            return pool.starmap(write_shard, tasks)
+
+
+def _catalog(products):
+    names = list(product_data)
+    prices = list(product_data.values())
+    for i in range(len(names), products):
+        names.append(f"product {i + 1}")
+        prices.append(float(10 + (i * 37) % 490))
+    return np.array(names[:products]), np.array(prices[:products], dtype=np.float64)
+
+
+#Indices 0..n-1, uniform for skew 0, otherwise with weights 1 / rank ** skew
+def _sample(rng, n, size, skew):
+    if not skew:
+        return rng.integers(0, n, size)
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return rng.choice(n, size=size, p=weights / weights.sum())
+
+
+def build_shard(settings, shard_index, rows):
+    rng = np.random.default_rng([settings["seed"], shard_index])
+    names, prices = _catalog(settings["products"])
+    start = np.datetime64(settings["start_date"])
+    days = int((np.datetime64(settings["end_date"]) - start).astype(int)) + 1
+
+    customer_id = _sample(rng, settings["customers"], rows, settings["skew"]) + 1
+    store_index = rng.integers(0, settings["stores"], rows)
+    product_index = _sample(rng, len(names), rows, settings["skew"])
+    sales_person_id = store_index * settings["sales_persons_per_store"] \
+        + rng.integers(0, settings["sales_persons_per_store"], rows) + 1
+    quantity = rng.integers(1, 11, rows)
+    price = prices[product_index]
+
+    columns = {
+        "customer_id": pa.array(customer_id.astype(np.int32)),
+        "store_id": pa.array((store_index + FIRST_STORE_ID).astype(np.int32)),
+        "product_name": pa.array(names[product_index]),
+        "sales_date": pa.array(start + rng.integers(0, days, rows).astype("timedelta64[D]")),
+        "sales_person_id": pa.array(sales_person_id.astype(np.int32)),
+        "price": pa.array(price),
+        "quantity": pa.array(quantity.astype(np.int32)),
+        "total_cost": pa.array(price * quantity),
+        "payment_mode": pa.array(np.array(["cash", "UPI"])[rng.integers(0, 2, rows)]),
+    }
+    return pa.table({name: columns[name] for name in variant_columns[settings["variant"]]})
+
+
+def write_shard(settings, shard_index, rows):
+    table = build_shard(settings, shard_index, rows)
+    file_name = f"sales_data_{settings['start_date']}_{shard_index:05d}.{settings['file_format']}"
+    path = os.path.join(settings["output_directory"], file_name)
+    if settings["file_format"] == "parquet":
+        pq.write_table(table, path)
+    else:
+        pv.write_csv(table, path, write_options=pv.WriteOptions(quoting_style="needed"))
+    return path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic sales data files")
+    parser.add_argument("--output", required=True, help="directory for the generated files")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--format", default="csv", choices=["csv", "parquet"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--customers", type=int, default=20)
+    parser.add_argument("--stores", type=int, default=3)
+    parser.add_argument("--sales-persons-per-store", type=int, default=3)
+    parser.add_argument("--products", type=int, default=len(product_data))
+    parser.add_argument("--start-date", default=datetime.date.today().isoformat())
+    parser.add_argument("--end-date", default=None, help="defaults to the start date")
+    parser.add_argument("--skew", type=float, default=0.0)
+    parser.add_argument("--variant", default="standard", choices=list(variant_columns))
+    parser.add_argument("--processes", type=int, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    generator = SalesDataGenerator(args.output, args.rows, shards=args.shards, file_format=args.format,
+                                   seed=args.seed, customers=args.customers, stores=args.stores,
+                                   sales_persons_per_store=args.sales_persons_per_store, products=args.products,
+                                   start_date=args.start_date, end_date=args.end_date or args.start_date,
+                                   skew=args.skew, variant=args.variant, processes=args.processes)
+    paths = generator.generate()
+    print(f"Generated {args.rows} rows in {len(paths)} files under {args.output}")
@@ -1,5 +1,5 @@
 import os
-from resources.dev import config
+from resources import config
 from src.main.utility.s3_client_object import *
 from src.main.utility.encrypt_decrypt import *
 s3_client_provider = S3ClientProvider(decrypt(config.aws_access_key), decrypt(config.aws_secret_key))
@@ -2,7 +2,7 @@ import shutil
 from src.main.utility.my_sql_session import get_mysql_connection
 from src.main.utility.spark_session import *
 import os
-from resources.dev import config
+from resources import config
 from src.main.utility.s3_client_object import *
 from src.main.utility.encrypt_decrypt import *
 
@@ -0,0 +1,59 @@
+import shutil
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pytest.importorskip("pyspark")
+pytest.importorskip("mysql.connector")
+if shutil.which("java") is None:
+    pytest.skip("Spark needs a Java runtime", allow_module_level=True)
+
+from pyspark.sql import SparkSession
+from resources import config
+from src.main.read.sales_data_read import read_sales_data, sales_data_columns
+from src.main.transformations.jobs.arrow_engine import ArrowEngine
+
+#The same source file must give the same rows on the Spark and the Arrow engine,
+#malformed values included: both read them as null (Spark's PERMISSIVE mode)
+
+HEADER = config.mandatory_columns + ["payment_mode"]
+
+MALFORMED_ROWS = [
+    "1,1,quaker oats,2024-03-05,1,212.5,2,425.0,cash",
+    "abc,1,sugar,2024-03-05,1,50,1,50,",
+    "2,+1,flour,2024-03-07,1,1.2.3,2,90,upi",
+    "3,1,rice,2024-13-45,2,10,99999999999,10,card",
+    "4,2,,not a date,2,1e2,1,100f,",
+    "5,2,milk,2024-03-09,3,-7.5,-1,Infinity,cash",
+]
+
+
+@pytest.fixture(scope="module")
+def spark():
+    session = SparkSession.builder.master("local[1]").appName("engine_parity").getOrCreate()
+    yield session
+    session.stop()
+
+
+@pytest.fixture
+def malformed_file(tmp_path):
+    path = tmp_path / "malformed_sales.csv"
+    path.write_text("\n".join([",".join(HEADER)] + MALFORMED_ROWS) + "\n")
+    return str(path)
+
+
+def spark_rows(spark, file_headers):
+    df = read_sales_data(spark, file_headers, config.mandatory_columns)
+    return sorted((tuple(row[column] for column in sales_data_columns) for row in df.collect()), key=repr)
+
+
+def arrow_rows(file_headers):
+    table = ArrowEngine().read_sales_data(file_headers, config.mandatory_columns)
+    columns = [table[column].to_pylist() for column in sales_data_columns]
+    return sorted(zip(*columns), key=repr)
+
+
+def test_malformed_file_reads_the_same_on_both_engines(spark, malformed_file):
+    file_headers = {malformed_file: HEADER}
+    expected = spark_rows(spark, file_headers)
+    assert len(expected) == len(MALFORMED_ROWS)
+    assert arrow_rows(file_headers) == expected
@@ -0,0 +1,77 @@
+import shutil
+import uuid
+import pytest
+
+pytest.importorskip("pyspark")
+mysql_connector = pytest.importorskip("mysql.connector")
+if shutil.which("java") is None:
+    pytest.skip("Spark needs a Java runtime", allow_module_level=True)
+
+from pyspark.sql import SparkSession
+from pyspark.sql.types import IntegerType, StringType, StructField, StructType
+from resources import config
+from src.main.utility import my_sql_session
+from src.main.write.database_write import DatabaseWriter
+
+#Rows bulk loaded with LOAD DATA must read back exactly as they were in Spark,
+#including values holding the old delimiter, tabs, line breaks and backslashes.
+#Needs the MySQL of the config profile with local_infile enabled on the server.
+
+SOURCE_ROWS = [
+    (1, "12, Park Street, Kolkata", "plain"),
+    (2, "tab\there", "back\\slash"),
+    (3, "line\nbreak\r\n", '"quoted", value'),
+    (4, None, ""),
+    (5, "  leading and trailing  ", "\\N"),
+]
+SCHEMA = StructType([StructField("id", IntegerType(), False),
+                     StructField("address", StringType(), True),
+                     StructField("note", StringType(), True)])
+
+
+@pytest.fixture(scope="module")
+def spark():
+    session = SparkSession.builder.master("local[1]").appName("load_data_write").getOrCreate()
+    yield session
+    session.stop()
+
+
+@pytest.fixture
+def load_data_table(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "mysql_allow_local_infile", True)
+    monkeypatch.setattr(config, "db_bulk_load_staging_directory", str(tmp_path))
+    monkeypatch.setattr(my_sql_session, "_pool", None)
+    try:
+        with my_sql_session.mysql_connection() as connection:
+            connection.ping()
+    except mysql_connector.Error as e:
+        pytest.skip(f"MySQL is not reachable : {e}")
+
+    table_name = f"load_data_test_{uuid.uuid4().hex[:8]}"
+
+    def execute(statement):
+        with my_sql_session.mysql_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(statement)
+                rows = cursor.fetchall() if cursor.with_rows else None
+                connection.commit()
+                return rows
+            finally:
+                cursor.close()
+
+    execute(f"CREATE TABLE {table_name} (id INT PRIMARY KEY, address VARCHAR(255), note VARCHAR(255))")
+    yield table_name, execute
+    execute(f"DROP TABLE IF EXISTS {table_name}")
+    monkeypatch.setattr(my_sql_session, "_pool", None)
+
+
+def test_load_data_round_trips_delimiters_and_escapes(spark, load_data_table):
+    table_name, execute = load_data_table
+    df = spark.createDataFrame(SOURCE_ROWS, SCHEMA)
+
+    writer = DatabaseWriter(config.url, config.properties, bulk_mode="load_data", num_writers=2)
+    assert writer.write_dataframe(df, table_name) == len(SOURCE_ROWS)
+
+    loaded = execute(f"SELECT id, address, note FROM {table_name} ORDER BY id")
+    assert [tuple(row) for row in loaded] == SOURCE_ROWS